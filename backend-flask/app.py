@@ -1,7 +1,10 @@
-from src import create_app
+from src import create_app, is_main_process
 
-# Crea la aplicación usando tu fábrica
-app = create_app(env='development')
+# Los workers "spawn" (conversión de PDFs, embeddings) re-ejecutan este módulo como
+# __mp_main__: solo el proceso principal crea la app
+if is_main_process():
+    # Crea la aplicación usando tu fábrica
+    app = create_app(env='development')
 
 if __name__ == "__main__":
     # Esto permite correrlo con "python app.py"
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Backfill: agrega metadata.section_base (título sin "(parte N)") a los chunks ingeridos
+antes de que el chunker lo guardara, y crea su índice de payload. Es idempotente.
+
+Uso:
+    python scripts/backfill_section_base.py [--document-id 12] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.pdf_chunker import section_base
+from src.utils.qdrant_service import QdrantService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--document-id", type=int, help="Solo los chunks de este documento")
+    parser.add_argument("--page-size", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar, sin escribir")
+    args = parser.parse_args()
+
+    qdrant = QdrantService()
+    creados = qdrant.ensure_payload_indexes()
+    if creados:
+        print(f"✅ Índices creados: {', '.join(creados)}")
+
+    scroll_filter = QdrantService._document_filter(args.document_id) if args.document_id else None
+    revisados = actualizados = 0
+    pendientes = defaultdict(list)
+
+    def escribir():
+        nonlocal actualizados
+        for base, ids in pendientes.items():
+            if not args.dry_run:
+                # key='metadata' actualiza el campo anidado sin pisar el resto de la metadata
+                qdrant.client.set_payload(
+                    collection_name=qdrant.collection_name,
+                    payload={'section_base': base},
+                    points=ids,
+                    key='metadata',
+                    wait=True
+                )
+            actualizados += len(ids)
+        pendientes.clear()
+
+    for point in qdrant._iter_scroll(scroll_filter, args.page_size):
+        revisados += 1
+        metadata = point.payload.get('metadata', {})
+        if metadata.get('section_base'):
+            continue
+        pendientes[section_base(metadata.get('section_title', ''))].append(point.id)
+        if sum(len(ids) for ids in pendientes.values()) >= args.page_size:
+            escribir()
+    escribir()
+
+    accion = "a actualizar" if args.dry_run else "actualizados"
+    print(f"✅ {revisados} chunks revisados, {actualizados} {accion}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Benchmark de búsqueda filtrada por documento a medida que crece la colección,
+con y sin índices de payload, y contra LocalVectorStore (NumPy en proceso) como línea
+base. Usa colecciones temporales (no toca "docs").
+
+Requiere un servidor Qdrant (el modo en memoria del cliente no usa índices).
+
+Uso:
+    python scripts/benchmark_filtered_search.py [--documentos 50,100,200,400] [--chunks-por-doc 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, FieldCondition, Filter, MatchValue, VectorParams
+
+from src.utils.local_vector_store import LocalVectorStore
+from src.utils.qdrant_service import PAYLOAD_INDEXES
+
+DIM = 1024
+
+
+def cargar_documentos(client, coleccion, desde, hasta, chunks_por_doc, rng):
+    for document_id in range(desde, hasta):
+        vectores = rng.standard_normal((chunks_por_doc, DIM), dtype=np.float32)
+        payloads = [
+            {
+                'pageContent': f"chunk {i} del documento {document_id}",
+                'metadata': {
+                    'document_id': document_id,
+                    'chunk_index': i,
+                    'section_title': f"Sección {i // 5}",
+                    'filename': f"doc_{document_id}.pdf",
+                }
+            }
+            for i in range(chunks_por_doc)
+        ]
+        client.upload_collection(
+            collection_name=coleccion,
+            vectors=vectores,
+            payload=payloads,
+            ids=[str(uuid.uuid4()) for _ in range(chunks_por_doc)],
+            batch_size=256,
+            wait=True
+        )
+
+
+def cargar_documentos_local(store, desde, hasta, chunks_por_doc, rng):
+    for document_id in range(desde, hasta):
+        vectores = rng.standard_normal((chunks_por_doc, DIM), dtype=np.float32)
+        chunks = [
+            {
+                'id': str(uuid.uuid4()),
+                'pageContent': f"chunk {i} del documento {document_id}",
+                'metadata': {'document_id': document_id, 'chunk_index': i}
+            }
+            for i in range(chunks_por_doc)
+        ]
+        store.insert_chunks(chunks, vectores)
+
+
+def medir_consultas_local(store, documentos, consultas, rng):
+    latencias = []
+    for _ in range(consultas):
+        document_id = int(rng.integers(documentos))
+        inicio = time.perf_counter()
+        store.search_similar(rng.standard_normal(DIM).astype(np.float32), limit=20, document_id=document_id)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return np.percentile(latencias, 50), np.percentile(latencias, 95)
+
+
+def medir_consultas(client, coleccion, documentos, consultas, rng):
+    latencias = []
+    for _ in range(consultas):
+        document_id = int(rng.integers(documentos))
+        inicio = time.perf_counter()
+        client.query_points(
+            collection_name=coleccion,
+            query=rng.standard_normal(DIM).astype(np.float32),
+            query_filter=Filter(must=[
+                FieldCondition(key="metadata.document_id", match=MatchValue(value=document_id))
+            ]),
+            limit=20,
+            with_payload=True
+        )
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return np.percentile(latencias, 50), np.percentile(latencias, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--documentos", default="50,100,200,400")
+    parser.add_argument("--chunks-por-doc", type=int, default=60)
+    parser.add_argument("--consultas", type=int, default=50)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url)
+    tamaños = [int(x) for x in args.documentos.split(",")]
+    resultados = {}
+
+    for con_indices in (False, True):
+        coleccion = f"benchmark_filtered_{'idx' if con_indices else 'noidx'}"
+        if client.collection_exists(coleccion):
+            client.delete_collection(coleccion)
+        client.create_collection(coleccion, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+        if con_indices:
+            for campo, schema in PAYLOAD_INDEXES.items():
+                client.create_payload_index(coleccion, field_name=campo, field_schema=schema, wait=True)
+
+        rng = np.random.default_rng(0)
+        cargados = 0
+        try:
+            for tamaño in tamaños:
+                cargar_documentos(client, coleccion, cargados, tamaño, args.chunks_por_doc, rng)
+                cargados = tamaño
+                resultados[(con_indices, tamaño)] = medir_consultas(client, coleccion, tamaño, args.consultas, rng)
+        finally:
+            client.delete_collection(coleccion)
+
+    store = LocalVectorStore()
+    rng = np.random.default_rng(0)
+    cargados = 0
+    for tamaño in tamaños:
+        cargar_documentos_local(store, cargados, tamaño, args.chunks_por_doc, rng)
+        cargados = tamaño
+        resultados[('numpy', tamaño)] = medir_consultas_local(store, tamaño, args.consultas, rng)
+
+    print(f"\n📊 Búsqueda filtrada por document_id ({args.chunks_por_doc} chunks por documento, top 20)\n")
+    print(f"{'Documentos':>10} {'Puntos':>8} | {'sin índices p50/p95 (ms)':>26} | {'con índices p50/p95 (ms)':>26} | "
+          f"{'numpy p50/p95 (ms)':>26}")
+    print("-" * 109)
+    for tamaño in tamaños:
+        sin = resultados[(False, tamaño)]
+        con = resultados[(True, tamaño)]
+        local = resultados[('numpy', tamaño)]
+        print(f"{tamaño:>10} {tamaño * args.chunks_por_doc:>8} | "
+              f"{sin[0]:>12.1f} / {sin[1]:<11.1f} | {con[0]:>12.1f} / {con[1]:<11.1f} | "
+              f"{local[0]:>12.1f} / {local[1]:<11.1f}")
+
+
+if __name__ == "__main__":
+    main()
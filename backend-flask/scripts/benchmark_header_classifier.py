@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark del clasificador de encabezados de PDFChunker (_parse_header): compara
+la versión actual (regex compiladas + chequeo del primer carácter) con la original
+(re.match sin compilar en cada línea) sobre el Markdown de PDFs reales.
+
+Reporta líneas/s de cada una y verifica que la clasificación de cada línea y los chunks
+resultantes sean idénticos.
+
+Uso:
+    python scripts/benchmark_header_classifier.py [archivos .md/.md.gz] [--repeticiones 20]
+    (sin archivos usa data/debug/*.md y el cache de Markdown en data/cache/markdown)
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.pdf_chunker import PDFChunker
+
+# Líneas que el corpus puede no tener y que igual tienen que clasificarse igual
+CASOS_BORDE = [
+    "", " ", "#", "# ", "####### demasiados", "#hashtag", "  # con sangría", "## Título ##",
+    "**A** y **B**", "**UNIDAD 1**", "_**III) Procesos**_", "  __2. Memoria__  ", "_ __OBJETOS__ _",
+    "**Año 2025**", "**Tel: (0221) 423-6609**", "**www.info.unlp.edu.ar**", "**<u>HERENCIA</u>**",
+    "**Calle 50 y 120 | La Plata**", "**ⓐⓑⓒⓓ**", "**ÑANDÚ Y ÁRBOL**", "**ß ss**", "***", "__", "_x_",
+    "**1)Sin espacio**", "**IV) Cuarto**", "* viñeta", "*énfasis simple*", "texto **en** medio",
+]
+
+
+class ChunkerOriginal(PDFChunker):
+    """PDFChunker con el clasificador de encabezados anterior, como referencia"""
+
+    def _is_footer(self, title: str) -> bool:
+        """True si el texto parece un pie de página (dirección, teléfono, web), no un título de sección."""
+        if not title or len(title) > 120:
+            return True
+        t = title.lower().strip()
+        # Patrones típicos de footers
+        if re.search(r'\btel\.?\s*[:\(]|\bwww\.|\.(com|edu|ar)\b', t):
+            return True
+        if re.search(r'\bc\.?\s*p\.?\s*\d+|calle\s+\d+|república\s+argentina', t):
+            return True
+        if '|' in t and (re.search(r'\d{4,}', t) or 'la plata' in t or 'c.p.' in t):
+            return True
+        return False
+
+    def _is_all_caps_heading(self, title: str) -> bool:
+        """Heurística: título en MAYÚSCULAS (ignora dígitos/signos)."""
+        letters = [c for c in (title or "") if c.isalpha()]
+        if len(letters) < 4:
+            return False
+        return all(c == c.upper() for c in letters)
+
+    def _looks_like_numbered_subheading(self, title: str) -> bool:
+        """Ej: '1) Introducción', '2) Procesos y Scheduling', 'III) ...'."""
+        if not title:
+            return False
+        return bool(
+            re.match(r'^\s*\d+\)\s+\S', title)
+            or re.match(r'^\s*\d+\.\s+\S', title)
+            or re.match(r'^\s*[IVXLCDM]+\)\s+\S', title)
+        )
+
+    def _extract_full_emphasis_title(self, line: str) -> str | None:
+        """
+        Extrae el texto si la línea es *solo* un título con énfasis completo.
+        Acepta:
+        - **TÍTULO**
+        - __TÍTULO__
+        - _**TÍTULO**_ (italics+bold, como en tu debug)
+        - _ __TÍTULO__ _
+        """
+        if line is None:
+            return None
+        s = line.strip()
+        # _**T**_ o **T**
+        m = re.match(r'^\s*_?\s*\*\*(.+?)\*\*\s*_?\s*$', s)
+        if m:
+            return m.group(1).strip()
+        # _ __T__ _ o __T__
+        m = re.match(r'^\s*_?\s*__(.+?)__\s*_?\s*$', s)
+        if m:
+            return m.group(1).strip()
+        return None
+
+    def _parse_header(self, line):
+        """
+        Detecta si la línea es un encabezado. Retorna (True, level, title) o (False, None, None).
+        - # ## ### → level 1, 2, 3...
+        - Línea SOLO con énfasis completo (**TÍTULO** o _**TÍTULO**_):
+          - Si está en MAYÚSCULAS → sección principal (level 1)
+          - Si parece numerada (1), 2), III)...) → subsección (level 2)
+          - Si parece footer (tel/web/dirección) → se ignora
+        """
+        # Encabezados markdown (# ## ###) siempre se aceptan
+        m = re.match(r'^(#{1,6})\s+(.+)$', line)
+        if m:
+            return True, len(m.group(1)), m.group(2).strip()
+        title = self._extract_full_emphasis_title(line)
+        if title is not None:
+            if self._is_footer(title):
+                return False, None, None
+            clean = re.sub(r'</?u>', '', title).strip()
+            if self._is_all_caps_heading(clean):
+                return True, 1, clean
+            if self._looks_like_numbered_subheading(clean):
+                return True, 2, clean
+            # Si no es MAYÚSCULAS ni numerada, por defecto no lo tomamos como header
+            # (evita cosas como 'Año 2025' u otros resaltados sueltos)
+            return False, None, None
+        return False, None, None
+
+
+def cargar_corpus(rutas):
+    textos = []
+    for ruta in rutas:
+        abrir = gzip.open if ruta.endswith('.gz') else open
+        with abrir(ruta, 'rt', encoding='utf-8') as f:
+            textos.append((os.path.basename(ruta), f.read()))
+    return textos
+
+
+def lineas_por_segundo(chunker, lineas, repeticiones):
+    parse = chunker._parse_header
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for linea in lineas:
+            parse(linea)
+    return len(lineas) * repeticiones / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archivos", nargs="*")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    rutas = args.archivos or sorted(
+        glob.glob(os.path.join(os.getcwd(), 'data', 'debug', '*.md'))
+        + glob.glob(os.path.join(os.getcwd(), 'data', 'cache', 'markdown', '*', '*.md.gz'))
+    )
+    corpus = cargar_corpus(rutas)
+    if not corpus:
+        print("❌ No hay Markdown para medir (subir un PDF o pasar archivos .md)")
+        sys.exit(1)
+
+    actual, original = PDFChunker(), ChunkerOriginal()
+    lineas = [linea for _, texto in corpus for linea in texto.split('\n')]
+    print(f"📚 {len(corpus)} archivos, {len(lineas)} líneas")
+
+    distintas = [
+        linea for linea in lineas + CASOS_BORDE
+        if actual._parse_header(linea) != original._parse_header(linea)
+    ]
+    chunks_iguales = all(
+        list(actual._split_by_sections(texto)) == list(original._split_by_sections(texto))
+        for _, texto in corpus
+    )
+
+    antes = lineas_por_segundo(original, lineas, args.repeticiones)
+    despues = lineas_por_segundo(actual, lineas, args.repeticiones)
+    encabezados = sum(1 for linea in lineas if actual._parse_header(linea)[0])
+
+    print(f"\n{'Clasificador':<12} {'Líneas/s':>12}")
+    print("-" * 25)
+    print(f"{'original':<12} {antes:>12,.0f}")
+    print(f"{'actual':<12} {despues:>12,.0f}")
+    print(f"\n⚡ Speedup: {despues / antes:.2f}x ({encabezados} encabezados detectados)")
+    print(f"{'✅' if not distintas else '❌'} Clasificación por línea idéntica"
+          f"{'' if not distintas else f' salvo en {len(distintas)} líneas: {distintas[:5]}'}")
+    print(f"{'✅' if chunks_iguales else '❌'} Chunks idénticos")
+    sys.exit(0 if not distintas and chunks_iguales else 1)
+
+
+if __name__ == "__main__":
+    main()
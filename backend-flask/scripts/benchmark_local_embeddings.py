@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark de throughput del embedding local (CPU): orden de llegada vs buckets por largo
+
+Uso:
+    python scripts/benchmark_local_embeddings.py data/programa.pdf [--repeticiones 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.embeddings import LocalEmbeddingService
+from src.utils.pdf_chunker import PDFChunker
+
+
+def medir(nombre, fn, textos, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = fn(textos)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:<28} {mejor:8.2f} s   {len(textos) / mejor:8.1f} chunks/s")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", help="PDF representativo (programa, reglamento, etc.)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    chunks = PDFChunker(max_chunk_size=1500, overlap=200).process_pdf(args.pdf)
+    textos = [f"passage: {c['text']}" for c in chunks]
+    largos = [len(t) for t in textos]
+    print(f"\n📄 {len(textos)} chunks (largo min/mediana/max: "
+          f"{min(largos)}/{int(np.median(largos))}/{max(largos)} caracteres)")
+
+    service = LocalEmbeddingService()
+    print(f"   Presupuesto de tokens por batch: {service.token_budget}\n")
+
+    # Calentar el modelo para no medir la primera inicialización
+    service.model.encode(textos[:2], show_progress_bar=False)
+
+    antes = medir(
+        "orden de llegada",
+        lambda t: service.model.encode(t, batch_size=args.batch_size, show_progress_bar=False, convert_to_numpy=True),
+        textos,
+        args.repeticiones
+    )
+    despues = medir(
+        "buckets por largo en tokens",
+        lambda t: service._encode_bucketed(t, max_batch_size=args.batch_size),
+        textos,
+        args.repeticiones
+    )
+
+    diferencia = float(np.max(np.abs(antes - despues)))
+    print(f"\n   Diferencia máxima entre vectores: {diferencia:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark de conversión PDF -> Markdown: una sola llamada vs rangos de páginas en
+paralelo, para distintos PDFs (páginas/s según cantidad de páginas). También verifica
+que el Markdown unido sea idéntico al de la conversión completa.
+
+Uso:
+    python scripts/benchmark_pdf_conversion.py [data/*.pdf] [--workers 2,4]
+    (sin archivos usa todos los PDF de data/)
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pymupdf
+
+from src.utils.pdf_markdown import _convert_pages, pdf_to_markdown
+
+
+def medir(fn, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = fn(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--workers", default="2,4")
+    parser.add_argument("--min-paginas", type=int, default=4)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join(os.getcwd(), 'data', '*.pdf')))
+    if not pdfs:
+        print("❌ No hay PDFs para medir")
+        sys.exit(1)
+    workers = [int(w) for w in args.workers.split(",")]
+
+    filas = []
+    for cantidad in workers:
+        with ProcessPoolExecutor(max_workers=cantidad, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Calentar los procesos (import de pymupdf) para no medir el arranque
+            list(pool.map(_convert_pages, [pdfs[0]] * cantidad, [[0]] * cantidad, [False] * cantidad))
+            for pdf in pdfs:
+                with pymupdf.open(pdf) as doc:
+                    paginas = doc.page_count
+                completo, segundos_uno = medir(pdf_to_markdown, pdf, workers=1)
+                paralelo, segundos_paralelo = medir(
+                    pdf_to_markdown, pdf, workers=cantidad, pool=pool, min_pages_per_task=args.min_paginas
+                )
+                filas.append((
+                    os.path.basename(pdf), paginas, cantidad,
+                    paginas / segundos_uno, paginas / segundos_paralelo,
+                    "sí" if completo == paralelo else "NO"
+                ))
+
+    print(f"\n{'PDF':<40} {'Págs':>5} {'Workers':>7} {'1 proceso (pág/s)':>18} {'paralelo (pág/s)':>17} "
+          f"{'Speedup':>8} {'Idéntico':>9}")
+    print("-" * 110)
+    for nombre, paginas, cantidad, uno, paralelo, igual in sorted(filas, key=lambda f: (f[1], f[2])):
+        print(f"{nombre[:40]:<40} {paginas:>5} {cantidad:>7} {uno:>18.1f} {paralelo:>17.1f} "
+              f"{paralelo / uno:>7.2f}x {igual:>9}")
+
+
+if __name__ == "__main__":
+    main()
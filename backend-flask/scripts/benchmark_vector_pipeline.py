@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark de memoria/throughput de la ingesta de vectores en Qdrant (1.000 chunks por defecto)
+
+Compara:
+  - listas: matriz -> .tolist() -> un PointStruct por punto -> upsert por batches (camino anterior)
+  - numpy:  matriz float32 contigua -> upload_collection
+
+insert_chunks usa el camino numpy solo en colecciones sin vector sparse (con el vector
+"title" envía {"": matriz, "title": matriz}). Con bm25 cada punto necesita su dict con el
+vector sparse, así que arma filas con listas como el camino anterior.
+
+Uso:
+    python scripts/benchmark_vector_pipeline.py [--chunks 1000] [--url http://localhost:6333]
+    (sin --url usa un Qdrant en memoria del propio cliente)
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+DIM = 1024
+BATCH_SIZE = 100
+
+
+def crear_coleccion(client, nombre):
+    if client.collection_exists(nombre):
+        client.delete_collection(nombre)
+    client.create_collection(nombre, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+
+
+def camino_listas(client, nombre, ids, vectores, payloads):
+    embeddings = vectores.tolist()
+    points = [
+        PointStruct(id=point_id, vector=embedding, payload=payload)
+        for point_id, embedding, payload in zip(ids, embeddings, payloads)
+    ]
+    for i in range(0, len(points), BATCH_SIZE):
+        client.upsert(collection_name=nombre, points=points[i:i + BATCH_SIZE], wait=True)
+
+
+def camino_numpy(client, nombre, ids, vectores, payloads):
+    client.upload_collection(
+        collection_name=nombre,
+        vectors=vectores,
+        payload=payloads,
+        ids=ids,
+        batch_size=BATCH_SIZE,
+        wait=True
+    )
+
+
+def medir(nombre, fn, *args):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    fn(*args)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(args[2])
+    print(f"  {nombre:<8} {segundos:7.2f} s   {n / segundos:8.0f} chunks/s   pico Python {pico / 1024 ** 2:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url) if args.url else QdrantClient(":memory:")
+    rng = np.random.default_rng(0)
+    vectores = rng.standard_normal((args.chunks, DIM), dtype=np.float32)
+    ids = [str(uuid.uuid4()) for _ in range(args.chunks)]
+    payloads = [
+        {'pageContent': "contenido " * 100, 'metadata': {'document_id': 0, 'chunk_index': i}}
+        for i in range(args.chunks)
+    ]
+
+    print(f"\n📦 {args.chunks} chunks de dimensión {DIM} ({vectores.nbytes / 1024 ** 2:.1f} MB en float32)\n")
+    for nombre, fn in (("listas", camino_listas), ("numpy", camino_numpy)):
+        coleccion = f"benchmark_pipeline_{nombre}"
+        crear_coleccion(client, coleccion)
+        medir(nombre, fn, client, coleccion, ids, vectores, payloads)
+        client.delete_collection(coleccion)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Verifica que un backend de embeddings (int8 / onnx) siga siendo compatible con los
+vectores fp32 ya guardados en la colección "docs" de Qdrant.
+
+Re-embede el pageContent de una muestra de puntos con el backend elegido y compara
+por similitud coseno contra el vector almacenado.
+
+Uso:
+    python scripts/check_embedding_backend.py --backend int8 [--muestra 200] [--umbral 0.99]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from qdrant_client import QdrantClient
+
+from src.utils.embeddings import EmbeddingModelProvider, LocalEmbeddingService, EMBEDDING_BACKENDS
+
+
+def obtener_muestra(client, collection_name, muestra):
+    """Trae puntos con vector y contenido (paginando el scroll)"""
+    puntos = []
+    offset = None
+    while len(puntos) < muestra:
+        batch, offset = client.scroll(
+            collection_name=collection_name,
+            limit=min(100, muestra - len(puntos)),
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        puntos.extend(p for p in batch if p.payload.get('pageContent') and p.vector is not None)
+        if offset is None:
+            break
+    return puntos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, required=True)
+    parser.add_argument("--muestra", type=int, default=200)
+    parser.add_argument("--umbral", type=float, default=0.99, help="Coseno medio mínimo aceptable")
+    parser.add_argument("--coleccion", default="docs")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    puntos = obtener_muestra(client, args.coleccion, args.muestra)
+    if not puntos:
+        print("❌ No hay puntos con contenido en la colección")
+        sys.exit(1)
+
+    print(f"🔍 Re-embebiendo {len(puntos)} chunks con backend '{args.backend}'...")
+    service = LocalEmbeddingService(provider=EmbeddingModelProvider(backend=args.backend))
+    nuevos = np.asarray(
+        service.get_embeddings([p.payload['pageContent'] for p in puntos], prefix="passage: "),
+        dtype=np.float32
+    )
+    guardados = np.asarray(
+        # Vector de contenido (sin nombre); los puntos también pueden tener "title" y "bm25"
+        [p.vector[""] if isinstance(p.vector, dict) else p.vector for p in puntos],
+        dtype=np.float32
+    )
+
+    nuevos /= np.linalg.norm(nuevos, axis=1, keepdims=True)
+    guardados /= np.linalg.norm(guardados, axis=1, keepdims=True)
+    cosenos = np.sum(nuevos * guardados, axis=1)
+
+    # Además del coseno punto a punto: ¿se mantiene el vecino más cercano dentro de la muestra?
+    vecino_nuevo = np.argsort(-(nuevos @ guardados.T), axis=1)[:, 0]
+    coincidencia_top1 = float(np.mean(vecino_nuevo == np.arange(len(puntos))))
+
+    print(f"\n📊 Similitud coseno {args.backend} vs fp32 almacenado ({len(puntos)} chunks)")
+    print(f"   media:      {cosenos.mean():.4f}")
+    print(f"   mínimo:     {cosenos.min():.4f}")
+    print(f"   percentil 5: {np.percentile(cosenos, 5):.4f}")
+    print(f"   top-1 propio: {coincidencia_top1:.1%}")
+
+    if cosenos.mean() < args.umbral:
+        print(f"\n❌ El backend '{args.backend}' NO es compatible (media < {args.umbral})")
+        sys.exit(1)
+    print(f"\n✅ El backend '{args.backend}' es compatible con los vectores existentes")
+
+
+if __name__ == "__main__":
+    main()
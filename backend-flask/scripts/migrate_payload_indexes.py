@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+Migración: crea los índices de payload (document_id, chunk_index, section_title, section_base, filename)
+en una colección existente. Es idempotente; el bootstrap de la app hace lo mismo al iniciar.
+
+Uso:
+    python scripts/migrate_payload_indexes.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.qdrant_service import QdrantService
+
+
+def main():
+    qdrant = QdrantService()
+    creados = qdrant.ensure_payload_indexes()
+    if creados:
+        print(f"✅ Índices creados: {', '.join(creados)}")
+    else:
+        print("✅ La colección ya tenía todos los índices")
+
+    schema = qdrant.client.get_collection(qdrant.collection_name).payload_schema or {}
+    print("\n📋 Índices de payload actuales:")
+    for campo, info in sorted(schema.items()):
+        print(f"  - {campo}: {info.data_type} ({info.points or 0} puntos)")
+
+
+if __name__ == "__main__":
+    main()
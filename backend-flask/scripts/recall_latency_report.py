@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Reporte recall vs latencia para elegir la configuración de la colección de chunks.
+
+Copia los vectores de la colección existente ("docs") a colecciones temporales con
+distintas combinaciones de cuantización / vectores en disco / HNSW (m, ef_construct),
+y para cada una mide recall@k contra la búsqueda exacta y la latencia p50/p95 variando
+hnsw_ef y el rescoring.
+
+Las consultas son preguntas reales, no puntos de la colección (cada uno sería su propio
+vecino más cercano e inflaría el recall): por defecto scripts/consultas_recall.txt,
+embebidas con el prefijo "query: " como en las búsquedas de la app.
+
+Uso:
+    python scripts/recall_latency_report.py [--consultas consultas.txt] [--k 10] [--salida reporte.md]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import OptimizersConfigDiff, QuantizationSearchParams, SearchParams
+
+from src.utils.embeddings import get_embedding_service
+from src.utils.qdrant_service import collection_settings
+
+# (nombre, cuantización, originales en disco, m, ef_construct)
+CONFIGURACIONES = [
+    ("fp32", "none", False, 16, 100),
+    ("fp32_m32", "none", False, 32, 200),
+    ("scalar_int8", "scalar", False, 16, 100),
+    ("scalar_int8_disco", "scalar", True, 16, 100),
+    ("binary", "binary", True, 16, 100),
+]
+HNSW_EF = [16, 32, 64, 128, 256]
+CONSULTAS = os.path.join(os.path.dirname(__file__), 'consultas_recall.txt')
+
+
+def leer_consultas(archivo):
+    with open(archivo, encoding='utf-8') as f:
+        return [linea.strip() for linea in f if linea.strip() and not linea.startswith('#')]
+
+
+def leer_vectores(client, coleccion):
+    ids, vectores = [], []
+    offset = None
+    while True:
+        puntos, offset = client.scroll(
+            collection_name=coleccion,
+            limit=256,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True
+        )
+        for p in puntos:
+            # Vector de contenido (sin nombre); los puntos también pueden tener "title" y "bm25"
+            vector = p.vector[""] if isinstance(p.vector, dict) else p.vector
+            ids.append(p.id)
+            vectores.append(vector)
+        if offset is None:
+            break
+    return ids, np.asarray(vectores, dtype=np.float32)
+
+
+def esperar_indexado(client, coleccion, timeout=600):
+    inicio = time.time()
+    while time.time() - inicio < timeout:
+        info = client.get_collection(coleccion)
+        if info.status.value == "green" and (info.indexed_vectors_count or 0) >= (info.points_count or 0):
+            return
+        time.sleep(1)
+    print(f"⚠️ '{coleccion}' no terminó de indexar en {timeout}s, se mide igual")
+
+
+def buscar(client, coleccion, consultas, k, params):
+    resultados, latencias = [], []
+    for vector in consultas:
+        inicio = time.perf_counter()
+        puntos = client.query_points(
+            collection_name=coleccion,
+            query=vector,
+            limit=k,
+            search_params=params,
+            with_payload=False
+        ).points
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        resultados.append({p.id for p in puntos})
+    return resultados, latencias
+
+
+def recall(resultados, verdad):
+    return float(np.mean([len(r & v) / max(len(v), 1) for r, v in zip(resultados, verdad)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--coleccion", default="docs")
+    parser.add_argument("--consultas", default=CONSULTAS, help="Archivo con una consulta por línea")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--salida", help="Archivo Markdown donde guardar el reporte")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url)
+    ids, vectores = leer_vectores(client, args.coleccion)
+    if len(ids) == 0:
+        print(f"❌ La colección '{args.coleccion}' no tiene vectores")
+        sys.exit(1)
+
+    textos = leer_consultas(args.consultas)
+    if not textos:
+        print(f"❌ No hay consultas en {args.consultas}")
+        sys.exit(1)
+    consultas = get_embedding_service().get_embeddings_array(textos, prefix="query: ")
+    print(f"📦 {len(ids)} vectores, {len(consultas)} consultas, recall@{args.k}\n")
+
+    filas = []
+    for nombre, cuantizacion, en_disco, m, ef_construct in CONFIGURACIONES:
+        coleccion = f"{args.coleccion}_bench_{nombre}"
+        if client.collection_exists(coleccion):
+            client.delete_collection(coleccion)
+        client.create_collection(
+            collection_name=coleccion,
+            # Forzar la construcción del HNSW aunque la colección sea chica
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=1),
+            **collection_settings(quantization=cuantizacion, on_disk=en_disco, m=m, ef_construct=ef_construct,
+                                  title_vector=False)
+        )
+        try:
+            client.upload_collection(coleccion, vectors=vectores, ids=ids, batch_size=256, wait=True)
+            esperar_indexado(client, coleccion)
+
+            verdad, latencias = buscar(client, coleccion, consultas, args.k, SearchParams(exact=True))
+            filas.append((nombre, "exacta", "-", 1.0, np.percentile(latencias, 50), np.percentile(latencias, 95)))
+
+            rescores = (True, False) if cuantizacion != "none" else (None,)
+            for rescore in rescores:
+                for hnsw_ef in HNSW_EF:
+                    params = SearchParams(
+                        hnsw_ef=hnsw_ef,
+                        quantization=QuantizationSearchParams(rescore=rescore, oversampling=2.0)
+                        if rescore is not None else None
+                    )
+                    resultados, latencias = buscar(client, coleccion, consultas, args.k, params)
+                    filas.append((
+                        nombre, hnsw_ef, {None: "-", True: "sí", False: "no"}[rescore],
+                        recall(resultados, verdad), np.percentile(latencias, 50), np.percentile(latencias, 95)
+                    ))
+        finally:
+            client.delete_collection(coleccion)
+        print(f"✅ {nombre} medido")
+
+    lineas = [
+        f"| Configuración | hnsw_ef | Rescore | Recall@{args.k} | p50 (ms) | p95 (ms) |",
+        "|---|---|---|---|---|---|",
+    ]
+    for nombre, hnsw_ef, rescore, rec, p50, p95 in filas:
+        lineas.append(f"| {nombre} | {hnsw_ef} | {rescore} | {rec:.3f} | {p50:.1f} | {p95:.1f} |")
+    reporte = "\n".join(lineas)
+
+    print("\n" + reporte)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(f"# Recall vs latencia — colección '{args.coleccion}' ({len(ids)} vectores, "
+                    f"{len(consultas)} consultas de {os.path.basename(args.consultas)})\n\n{reporte}\n")
+        print(f"\n💾 Reporte guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
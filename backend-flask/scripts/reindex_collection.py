@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Reindexación completa sin corte: construye "docs_vN" desde los PDFs guardados en data/
+mientras la app y n8n siguen usando la versión vigente, y al terminar mueve el alias
+"docs" de forma atómica. Se conservan las versiones anteriores para poder volver.
+
+Uso:
+    python scripts/reindex_collection.py estado
+    python scripts/reindex_collection.py reindexar [--conservar 2] [--migrar-legacy] [--forzar]
+    python scripts/reindex_collection.py rollback
+
+--migrar-legacy: la primera vez, si "docs" todavía es una colección física (instalación
+anterior a las versiones), la borra justo antes de crear el alias.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import create_app
+from src.core.board.document import Document
+from src.core.database import db
+from src.utils import collection_versions
+from src.utils.qdrant_service import get_qdrant_client
+from src.utils.reindex import read_status, reindex_documents
+
+
+def estado(client, alias):
+    actual = collection_versions.resolve_alias(client, alias)
+    if actual is None and client.collection_exists(alias):
+        print(f"⚠️ '{alias}' es una colección física (sin versiones todavía)")
+    else:
+        print(f"🔗 Alias '{alias}' -> {actual or '(no existe)'}")
+    for _, nombre in collection_versions.list_versions(client, alias):
+        puntos = client.count(nombre, exact=True).count
+        marca = " ← vigente" if nombre == actual else ""
+        print(f"  - {nombre}: {puntos} puntos{marca}")
+
+    ultimo = read_status()
+    if ultimo:
+        print(f"\n📋 Última reindexación ({ultimo['target']}): {ultimo['status']}")
+        print(json.dumps(ultimo['throughput'], indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("accion", choices=("estado", "reindexar", "rollback"))
+    parser.add_argument("--conservar", type=int, default=2, help="Versiones a conservar (incluida la nueva)")
+    parser.add_argument("--migrar-legacy", action="store_true")
+    parser.add_argument("--forzar", action="store_true", help="Cambiar el alias aunque fallen documentos")
+    args = parser.parse_args()
+
+    alias = os.getenv("QDRANT_COLLECTION", "docs")
+    client = get_qdrant_client()
+
+    if args.accion == "estado":
+        estado(client, alias)
+    elif args.accion == "rollback":
+        anterior = collection_versions.rollback(client, alias)
+        print(f"✅ Rollback: '{alias}' vuelve a '{anterior}'")
+    else:
+        if collection_versions.is_legacy_collection(client, alias) and not args.migrar_legacy:
+            print(f"❌ '{alias}' es una colección física: la primera reindexación requiere --migrar-legacy")
+            sys.exit(1)
+        app = create_app()
+
+        def cargar_documentos():
+            # Cada pasada tiene que ver los cambios que la app hizo mientras tanto
+            db.session.expire_all()
+            return db.session.query(Document).order_by(Document.id).all()
+
+        with app.app_context():
+            progreso = reindex_documents(
+                cargar_documentos,
+                alias=alias,
+                client=client,
+                keep_versions=args.conservar,
+                drop_legacy=args.migrar_legacy,
+                force=args.forzar
+            )
+        print(f"\n{'✅' if progreso.status == 'done' else '❌'} {progreso.documents_done} documentos, "
+              f"{progreso.chunks_written} chunks en {progreso.elapsed_seconds:.0f}s -> {progreso.target}")
+        sys.exit(0 if progreso.status == "done" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ Búsqueda directa en Qdrant sin servicios
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from src.utils.embeddings import EmbeddingService
+from src.utils.embeddings import get_embedding_service
 import os
 
 def test_direct_search():
@@ -15,7 +15,7 @@ def test_direct_search():
     
     # 1. Generar embedding
     print("1️⃣ Generando embedding...")
-    embedding_service = EmbeddingService()
+    embedding_service = get_embedding_service()
     query_embedding = embedding_service.get_embedding(query)
     print(f"✅ Embedding generado (dim: {len(query_embedding)})")
     
@@ -56,12 +56,15 @@ def test_direct_search():
         print(f"⚠️ search_batch falló: {e}")
         print("Intentando con scroll + comparación manual...")
         
-        # OPCIÓN 2: Método de respaldo - traer todos y ordenar manualmente
-        all_points = []
+        # OPCIÓN 2: Método de respaldo - traer los vectores del documento y buscar en memoria
+        from src.utils.local_vector_store import LocalVectorStore
+        
+        store = LocalVectorStore()
+        chunks, vectores = [], []
         offset = None
         
         while True:
-            result = client.scroll(
+            points, offset = client.scroll(
                 collection_name="docs",
                 scroll_filter=query_filter,
                 limit=100,
@@ -69,39 +72,27 @@ def test_direct_search():
                 with_payload=True,
                 with_vectors=True
             )
-            
-            points, offset = result
-            if not points:
-                break
-            all_points.extend(points)
+            for point in points:
+                chunks.append({'id': point.id, **point.payload})
+                # Con vectores nombrados (denso + sparse) el denso es el de nombre ""
+                vectores.append(point.vector[""] if isinstance(point.vector, dict) else point.vector)
             if offset is None:
                 break
         
-        # Calcular similitud coseno manualmente
-        import numpy as np
+        if chunks:
+            store.insert_chunks(chunks, vectores)
         
-        def cosine_similarity(a, b):
-            return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-        
-        query_vec = np.array(query_embedding)
+        # Crear objeto similar a hit
+        class Hit:
+            def __init__(self, id, score, payload):
+                self.id = id
+                self.score = score
+                self.payload = payload
         
         hits = []
-        for point in all_points:
-            point_vec = np.array(point.vector)
-            score = cosine_similarity(query_vec, point_vec)
-            
-            # Crear objeto similar a hit
-            class Hit:
-                def __init__(self, id, score, payload):
-                    self.id = id
-                    self.score = score
-                    self.payload = payload
-            
-            hits.append(Hit(point.id, float(score), point.payload))
-        
-        # Ordenar por score descendente
-        hits.sort(key=lambda x: x.score, reverse=True)
-        hits = hits[:10]
+        for chunk in store.search_similar(query_embedding, limit=10):
+            page_content = chunk['payload'].pop('pageContent', '')
+            hits.append(Hit(chunk['id'], chunk['score'], {'pageContent': page_content, 'metadata': chunk['payload']}))
     
     print(f"✅ Encontrados {len(hits)} resultados\n")
     
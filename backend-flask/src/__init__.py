@@ -1,18 +1,35 @@
-from flask import Flask, redirect, url_for
-from src.core.config import config_by_name
-from src.core.database import db, reset_db 
-from src.web.controllers.auth_controller import authentication_blueprint
-from src.web.controllers.user_controller import user_blueprint
-from src.web.controllers.document_controller import document_blueprint
-from src.web.controllers.whatsapp_controller import whatsapp_blueprint
-from src.web.controllers.system_controller import system_blueprint
-from src.web.controllers.status_controller import status_blueprint
-
-# Import models to ensure they are registered with SQLAlchemy
-from src.core.auth.user import User
-from src.core.board.document import Document
+import multiprocessing
 import os
+
+# Las importaciones de Flask, modelos y blueprints van dentro de create_app: los workers
+# "spawn" (conversión de PDFs, embeddings) importan módulos de src.utils y no deben cargar la app.
+
+
+def is_main_process() -> bool:
+    """
+    False en procesos hijos de multiprocessing. parent_process() recién se completa después
+    de que spawn re-ejecuta el módulo principal, pero el nombre del proceso ya está puesto.
+    """
+    return multiprocessing.parent_process() is None and multiprocessing.current_process().name == "MainProcess"
+
+
 def create_app(env='development', static_folder=None):
+    from flask import Flask, redirect, url_for
+    from src.core.config import config_by_name
+    from src.core.database import db, reset_db
+    from src.web.controllers.auth_controller import authentication_blueprint
+    from src.web.controllers.user_controller import user_blueprint
+    from src.web.controllers.document_controller import document_blueprint
+    from src.web.controllers.whatsapp_controller import whatsapp_blueprint
+    from src.web.controllers.system_controller import system_blueprint
+    from src.web.controllers.status_controller import status_blueprint
+
+    # Import models to ensure they are registered with SQLAlchemy
+    from src.core.auth.user import User
+    from src.core.board.document import Document
+    from src.utils.embeddings import preload_local_model
+    from src.utils.qdrant_service import bootstrap_qdrant
+
     # template_folder es relativo al directorio donde está __init__.py (src/)
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))      # .../project/src
     PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))  # .../project
@@ -29,6 +46,15 @@ def create_app(env='development', static_folder=None):
 
     db.init_app(app)
 
+    # En un proceso hijo de multiprocessing (workers spawn) no se repiten los efectos de arranque
+    if is_main_process():
+        # Precargar el modelo de embeddings local (evita pagar la carga en la primera búsqueda)
+        if os.getenv("EMBEDDINGS_PRELOAD", "false").lower() == "true":
+            preload_local_model()
+
+        # Verificar/crear la colección de Qdrant una sola vez (si falla, se reintenta en el primer uso)
+        bootstrap_qdrant()
+
     # Registro de blueprints
     app.register_blueprint(authentication_blueprint)
     app.register_blueprint(user_blueprint)
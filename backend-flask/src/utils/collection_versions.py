@@ -0,0 +1,117 @@
+import re
+from typing import List, Tuple
+
+from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+
+def versioned_name(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
+
+
+def list_versions(client, alias: str) -> List[Tuple[int, str]]:
+    """Colecciones físicas "<alias>_vN" existentes, ordenadas por versión"""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    versions = []
+    for collection in client.get_collections().collections:
+        match = pattern.match(collection.name)
+        if match:
+            versions.append((int(match.group(1)), collection.name))
+    return sorted(versions)
+
+
+def resolve_alias(client, alias: str) -> str | None:
+    """Colección a la que apunta el alias (None si el alias no existe)"""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def is_legacy_collection(client, alias: str) -> bool:
+    """True si existe una colección física con el nombre del alias (instalaciones previas a las versiones)"""
+    return resolve_alias(client, alias) is None and client.collection_exists(alias)
+
+
+def create_version(client, alias: str, settings: dict) -> str:
+    """Crea la siguiente colección versionada (vacía) y devuelve su nombre"""
+    versions = list_versions(client, alias)
+    name = versioned_name(alias, versions[-1][0] + 1 if versions else 1)
+    client.create_collection(collection_name=name, **settings)
+    return name
+
+
+def bootstrap_version(client, alias: str, settings: dict) -> str:
+    """
+    Instalación nueva: deja el alias apuntando a una colección versionada. Es idempotente
+    entre procesos que arrancan a la vez: todos eligen la misma colección (la versión más
+    alta existente, o "<alias>_v1") y si otro la creó o creó el alias primero se usa esa.
+    """
+    versions = list_versions(client, alias)
+    name = versions[-1][1] if versions else versioned_name(alias, 1)
+    if not versions:
+        try:
+            client.create_collection(collection_name=name, **settings)
+        except Exception:
+            if not client.collection_exists(name):
+                raise
+    if resolve_alias(client, alias) is None:
+        try:
+            client.update_collection_aliases(change_aliases_operations=[
+                CreateAliasOperation(create_alias=CreateAlias(collection_name=name, alias_name=alias))
+            ])
+        except Exception:
+            if resolve_alias(client, alias) is None:
+                raise
+    return resolve_alias(client, alias)
+
+
+def swap_alias(client, alias: str, target: str, drop_legacy: bool = False):
+    """
+    Apunta el alias a `target` en una sola operación atómica: las búsquedas (app y n8n)
+    pasan de una colección a la otra sin ver nunca una colección a medio cargar.
+
+    Si todavía existe la colección física original con el nombre del alias, hay que
+    borrarla antes (drop_legacy=True): es el único paso con un corte breve y ocurre una vez.
+    """
+    if is_legacy_collection(client, alias):
+        if not drop_legacy:
+            raise RuntimeError(
+                f"'{alias}' es una colección física, no un alias: usar drop_legacy para reemplazarla"
+            )
+        print(f"⚠️ Borrando la colección original '{alias}' para reemplazarla por un alias")
+        client.delete_collection(alias)
+
+    operations = []
+    if resolve_alias(client, alias) is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"🔀 Alias '{alias}' -> '{target}'")
+
+
+def rollback(client, alias: str) -> str:
+    """Vuelve el alias a la versión anterior a la actual y devuelve su nombre"""
+    current = resolve_alias(client, alias)
+    anteriores = [name for version, name in list_versions(client, alias) if name != current
+                  and (current is None or version < _version_of(alias, current))]
+    if not anteriores:
+        raise RuntimeError(f"No hay una versión anterior a '{current}' para volver")
+    swap_alias(client, alias, anteriores[-1])
+    return anteriores[-1]
+
+
+def drop_old_versions(client, alias: str, keep: int = 2) -> List[str]:
+    """Borra las versiones más viejas, conservando las `keep` más nuevas y la apuntada por el alias"""
+    current = resolve_alias(client, alias)
+    versions = [name for _, name in list_versions(client, alias)]
+    dropped = []
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != current:
+            client.delete_collection(name)
+            dropped.append(name)
+    return dropped
+
+
+def _version_of(alias: str, name: str) -> int:
+    match = re.match(rf"^{re.escape(alias)}_v(\d+)$", name)
+    return int(match.group(1)) if match else 0
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos, solo entre threads
+    fcntl = None
+
+KEY_SIZE = 16
+HEADER_FIELDS = 4  # [escrituras totales, capacidad, dimensión, versión]
+CACHE_VERSION = 1
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings direccionado por contenido.
+
+    La clave es un hash de modelo + prefijo ("passage: "/"query: ") + texto. Los vectores
+    se guardan como float32 en un archivo memory-mapped (las páginas se comparten entre
+    workers) con un LRU en memoria adelante. Cuando se llena, se reemplazan las entradas
+    más viejas (buffer circular), así el tamaño en disco queda acotado.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int = 1024,
+                 max_mb: int = 256, memory_items: int = 2048):
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max(1, int(max_mb * 1024 ** 2) // (dim * 4 + KEY_SIZE))
+        self.memory_items = memory_items
+
+        model_slug = hashlib.sha1(model_name.encode()).hexdigest()[:12]
+        self.path = Path(cache_dir) / f"{model_slug}_{dim}"
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._index = {}
+        self._seen_writes = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._open()
+
+    @classmethod
+    def from_env(cls, model_name: str, dim: int = 1024):
+        """Crea el cache según variables de entorno, o None si está deshabilitado"""
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        cache_dir = os.getenv(
+            "EMBEDDING_CACHE_DIR",
+            os.path.join(os.getcwd(), 'data', 'cache', 'embeddings')
+        )
+        try:
+            return cls(
+                cache_dir,
+                model_name,
+                dim=dim,
+                max_mb=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256")),
+                memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048")),
+            )
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir el cache de embeddings, se continúa sin cache: {e}")
+            return None
+
+    # ------------------------------------------------------------------ archivos
+
+    def _open(self):
+        header_file = self.path / "header.i64"
+        keys_file = self.path / "keys.bin"
+        vectors_file = self.path / "vectors.f32"
+
+        with self._file_lock():
+            expected = [self.capacity, self.dim, CACHE_VERSION]
+            valid = (
+                header_file.exists() and keys_file.exists() and vectors_file.exists()
+                and list(np.fromfile(header_file, dtype=np.int64)[1:HEADER_FIELDS]) == expected
+                and keys_file.stat().st_size == self.capacity * KEY_SIZE
+                and vectors_file.stat().st_size == self.capacity * self.dim * 4
+            )
+            if not valid:
+                # Archivos inexistentes o creados con otra capacidad/dimensión: se recrean en
+                # archivos nuevos (rename) sin truncar los que otros workers tienen mapeados.
+                # El header va último: hasta que se reemplaza, los archivos no validan.
+                self._replace_file(keys_file, np.uint8, (self.capacity, KEY_SIZE))
+                self._replace_file(vectors_file, np.float32, (self.capacity, self.dim))
+                self._replace_file(header_file, np.int64, (HEADER_FIELDS,), [0, *expected])
+
+            self._header = np.memmap(header_file, dtype=np.int64, mode='r+', shape=(HEADER_FIELDS,))
+            self._keys = np.memmap(keys_file, dtype=np.uint8, mode='r+', shape=(self.capacity, KEY_SIZE))
+            self._vectors = np.memmap(vectors_file, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+
+        self._rebuild_index()
+
+    @staticmethod
+    def _replace_file(path: Path, dtype, shape, values=None):
+        """Crea el archivo completo con otro nombre y lo reemplaza con un rename atómico"""
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        data = np.memmap(tmp, dtype=dtype, mode='w+', shape=shape)
+        if values is not None:
+            data[:] = values
+        data.flush()
+        del data
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Lock exclusivo entre procesos para escrituras (no-op si no hay fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path / ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rebuild_index(self):
+        self._index = {}
+        for slot in np.flatnonzero(self._keys.any(axis=1)):
+            self._index[self._keys[slot].tobytes()] = int(slot)
+        self._seen_writes = int(self._header[0])
+
+    def _refresh_index(self):
+        """Incorpora al índice las entradas escritas por otros workers desde la última lectura"""
+        writes = int(self._header[0])
+        if writes == self._seen_writes:
+            return
+        if writes - self._seen_writes >= self.capacity:
+            self._rebuild_index()
+            return
+        # Las claves viejas de esos slots ya fueron pisadas en disco; get() las descarta al verificar
+        for n in range(self._seen_writes, writes):
+            slot = n % self.capacity
+            key = self._keys[slot].tobytes()
+            if any(key):
+                self._index[key] = slot
+        self._seen_writes = writes
+
+    def _drop_slot(self, slot: int):
+        """Saca del índice la clave que ocupa el slot (antes de reemplazarla)"""
+        key = self._keys[slot].tobytes()
+        if self._index.get(key) == slot:
+            del self._index[key]
+
+    # ------------------------------------------------------------------ API
+
+    def key(self, text: str, prefix: str = "") -> bytes:
+        """Clave direccionada por contenido: modelo + prefijo + texto"""
+        return hashlib.blake2b(
+            f"{self.model_name}\0{prefix}\0{text}".encode('utf-8'),
+            digest_size=KEY_SIZE
+        ).digest()
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return vector
+
+            slot = self._index.get(key)
+            if slot is None:
+                self._refresh_index()
+                slot = self._index.get(key)
+
+            if slot is not None:
+                vector = np.array(self._vectors[slot])
+                # Verificar que otro worker no haya reemplazado el slot mientras leíamos
+                if self._keys[slot].tobytes() == key:
+                    self._remember(key, vector)
+                    self.hits_disk += 1
+                    return vector
+                self._index.pop(key, None)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, vector) -> None:
+        self.put_many([key], [vector])
+
+    def put_many(self, keys, vectors) -> None:
+        """Guarda varios vectores tomando el lock de archivo una sola vez"""
+        entries = []
+        for key, vector in zip(keys, vectors):
+            # Copia: una fila de la matriz del batch mantendría viva toda la matriz en el LRU
+            vector = np.array(vector, dtype=np.float32)
+            if vector.shape == (self.dim,):
+                entries.append((key, vector))
+        if not entries:
+            return
+
+        with self._lock:
+            for key, vector in entries:
+                self._remember(key, vector)
+
+            with self._file_lock():
+                self._refresh_index()
+                for key, vector in entries:
+                    if key in self._index:
+                        continue
+
+                    writes = int(self._header[0])
+                    slot = writes % self.capacity
+                    self._drop_slot(slot)
+
+                    # Invalidar la clave antes de escribir el vector para que ningún lector lo mezcle
+                    self._keys[slot] = 0
+                    self._vectors[slot] = vector
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                    self._header[0] = writes + 1
+
+                    self._index[key] = slot
+                    self._seen_writes = writes + 1
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def flush(self):
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            self._header.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            'hits_memory': self.hits_memory,
+            'hits_disk': self.hits_disk,
+            'misses': self.misses,
+            'hit_rate': round((self.hits_memory + self.hits_disk) / lookups, 3) if lookups else None,
+            'entries': len(self._index),
+            'capacity': self.capacity,
+            'size_mb': round(self.capacity * (self.dim * 4 + KEY_SIZE) / 1024 ** 2, 1),
+        }
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+import numpy as np
+
+from src.utils.embeddings import EMBEDDING_DIM, get_embedding_service
+
+
+def _init_worker(threads: int):
+    """Inicializa un worker: limita los threads de torch y carga el modelo una sola vez"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    get_embedding_service()
+
+
+def _embed_in_worker(texts: List[str], prefix: str) -> np.ndarray:
+    # Se devuelve float32 contiguo: se serializa mucho más barato que listas de floats
+    return get_embedding_service().get_embeddings_array(texts, batch_size=10, prefix=prefix)
+
+
+class EmbeddingWorkerPool:
+    """
+    Pool de procesos dedicados a generar embeddings de ingesta.
+
+    Cada worker carga el modelo una vez y la cola de entrada está acotada: si los
+    workers están ocupados, quien encola espera (backpressure) en lugar de acumular
+    trabajo en memoria. Así la inferencia no compite por el GIL del proceso de Flask.
+    """
+
+    def __init__(self, workers: int, queue_size: int, threads_per_worker: int, task_size: int = 32):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.task_size = task_size
+        self.threads_per_worker = threads_per_worker
+        self.restarts = 0
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._pending = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,)
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Reemplaza un executor roto (p. ej. un worker muerto por OOM); una sola vez si hay varios threads"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self.restarts += 1
+        print("⚠️ Un worker de embeddings murió: se recrea el pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def embed(self, texts: List[str], prefix: str = "passage: ") -> np.ndarray:
+        """Reparte los textos en tareas para los workers y devuelve los vectores en orden"""
+        executor = self._executor
+        try:
+            return self._embed(executor, texts, prefix)
+        except BrokenProcessPool:
+            # Se reintenta una vez con un pool nuevo; si vuelve a romperse, el error sube
+            self._restart(executor)
+            return self._embed(self._executor, texts, prefix)
+
+    def _embed(self, executor: ProcessPoolExecutor, texts: List[str], prefix: str) -> np.ndarray:
+        futures = []
+        for i in range(0, len(texts), self.task_size):
+            self._slots.acquire()
+            with self._lock:
+                self._pending += 1
+            try:
+                future = executor.submit(_embed_in_worker, texts[i:i + self.task_size], prefix)
+            except BaseException:
+                self._task_done(None)
+                raise
+            future.add_done_callback(self._task_done)
+            futures.append(future)
+
+        if not futures:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.concatenate([f.result() for f in futures])
+
+    def _task_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'pending_tasks': self._pending,
+            'completed_tasks': self._completed,
+            'restarts': self.restarts,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ingestion_pool() -> EmbeddingWorkerPool | None:
+    """Pool compartido de ingesta, o None si EMBEDDING_WORKERS=0 (embeddings en el proceso web)"""
+    global _pool
+    workers = int(os.getenv("EMBEDDING_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                cores = os.cpu_count() or 1
+                _pool = EmbeddingWorkerPool(
+                    workers=workers,
+                    queue_size=int(os.getenv("EMBEDDING_WORKER_QUEUE", str(workers * 2))),
+                    # Por defecto se deja un core libre para las requests web
+                    threads_per_worker=int(os.getenv(
+                        "EMBEDDING_WORKER_THREADS",
+                        str(max(1, (cores - 1) // workers))
+                    )),
+                )
+    return _pool
+
+
+def current_ingestion_pool() -> EmbeddingWorkerPool | None:
+    """El pool si ya se creó (None si no): para métricas, sin levantar workers"""
+    return _pool
+
+
+def embed_passages(texts: List[str]) -> np.ndarray:
+    """Embeddings de chunks para ingesta (float32, n x dim): en el pool de workers si está habilitado"""
+    pool = get_ingestion_pool()
+    if pool is None:
+        return get_embedding_service().get_embeddings_array(texts, batch_size=10, prefix="passage: ")
+    return pool.embed(texts, prefix="passage: ")
@@ -1,26 +1,204 @@
 from pydoc import text
 from sys import prefix
 
-import requests
 import os
+import threading
+import time
 from typing import List
 import numpy as np
 
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.hf_client import HuggingFaceEmbeddingClient
+from src.utils.metrics import current_rss_bytes
+from src.utils.query_batcher import QueryMicroBatcher
+
+MODEL_NAME = "intfloat/multilingual-e5-large"
+EMBEDDING_DIM = 1024
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+
+
+class EmbeddingModelProvider:
+    """
+    Mantiene una única instancia del modelo SentenceTransformer por proceso.
+
+    El modelo (~2 GB) se carga una sola vez, de forma perezosa o al iniciar la app,
+    y se comparte entre todos los EmbeddingService / LocalEmbeddingService.
+
+    Backends (EMBEDDING_BACKEND):
+    - torch: PyTorch en precisión completa (default)
+    - int8: PyTorch con cuantización dinámica int8 de las capas lineales (CPU)
+    - onnx: ONNX Runtime vía sentence-transformers (EMBEDDING_ONNX_FILE elige
+      una variante cuantizada, ej. onnx/model_qint8_avx512_vnni.onnx)
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = None):
+        self.model_name = model_name
+        self.backend = (backend or os.getenv("EMBEDDING_BACKEND", "torch")).lower()
+        if self.backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"EMBEDDING_BACKEND inválido '{self.backend}', opciones: {', '.join(EMBEDDING_BACKENDS)}")
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.parameters_bytes = None
+        self.rss_delta_bytes = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def variant(self) -> str:
+        """Identifica los vectores que produce: modelo + backend (+ archivo ONNX)"""
+        variant = f"{self.model_name}|{self.backend}"
+        if self.backend == "onnx" and os.getenv("EMBEDDING_ONNX_FILE"):
+            variant += f"|{os.getenv('EMBEDDING_ONNX_FILE')}"
+        return variant
+
+    def get_model(self):
+        """Devuelve el modelo, cargándolo la primera vez (thread-safe)"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📥 Cargando modelo de embeddings localmente ({self.model_name}, backend {self.backend})...")
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+
+        if self.backend == "onnx":
+            onnx_file = os.getenv("EMBEDDING_ONNX_FILE")
+            model = SentenceTransformer(
+                self.model_name,
+                device="cpu",
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file} if onnx_file else None
+            )
+        else:
+            model = SentenceTransformer(self.model_name, device="cpu" if self.backend == "int8" else None)
+            if self.backend == "int8":
+                import torch
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            self.rss_delta_bytes = rss_after - rss_before
+        try:
+            self.parameters_bytes = state_dict_bytes(model)
+        except Exception:
+            self.parameters_bytes = None
+
+        print(f"✅ Modelo cargado en {self.load_seconds:.1f}s")
+        return model
+
+    def stats(self) -> dict:
+        """Tiempo de carga y huella de memoria del modelo"""
+        return {
+            'model': self.model_name,
+            'backend': self.backend,
+            'loaded': self.is_loaded,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'parameters_mb': round(self.parameters_bytes / 1024 ** 2, 1) if self.parameters_bytes else None,
+            'rss_delta_mb': round(self.rss_delta_bytes / 1024 ** 2, 1) if self.rss_delta_bytes is not None else None,
+        }
+
+
+def state_dict_bytes(model) -> int:
+    """
+    Bytes de los tensores del state_dict. A diferencia de model.parameters(), incluye los
+    pesos empaquetados de las capas Linear de quantize_dynamic (tuplas en _packed_params).
+    """
+    import torch
+
+    seen = set()
+    total = 0
+    pending = list(model.state_dict().values())
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (tuple, list)):
+            pending.extend(value)
+        elif torch.is_tensor(value) and value.data_ptr() not in seen:
+            # Pesos compartidos (embeddings atados) se cuentan una vez
+            seen.add(value.data_ptr())
+            total += value.numel() * value.element_size()
+    return total
+
+
+_model_provider = EmbeddingModelProvider()
+_embedding_service = None
+_embedding_service_lock = threading.Lock()
+
+
+def get_model_provider() -> EmbeddingModelProvider:
+    """Proveedor del modelo local compartido por todo el proceso"""
+    return _model_provider
+
+
+def get_embedding_service() -> "EmbeddingService":
+    """Instancia compartida de EmbeddingService (se crea una sola vez por proceso)"""
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+def current_embedding_service() -> "EmbeddingService | None":
+    """La instancia compartida si ya se creó (None si no): para métricas, sin cargar nada"""
+    return _embedding_service
+
+
+def preload_local_model():
+    """Carga el modelo local en segundo plano para que la primera request no pague la carga"""
+    threading.Thread(
+        target=_model_provider.get_model,
+        name="embedding-model-preload",
+        daemon=True
+    ).start()
+
+
 class EmbeddingService:
     """Servicio para generar embeddings usando HuggingFace API con fallback a local"""
     
     def __init__(self):
         self.hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
-        self.model = "intfloat/multilingual-e5-large"
+        self.model = MODEL_NAME
         self.api_url = f"https://router.huggingface.co/hf-inference/models/{self.model}"
         self.local_service = None
+        # El backend es parte de la clave: int8/onnx no reutilizan vectores fp32 (ni al revés)
+        self.cache = EmbeddingCache.from_env(get_model_provider().variant, dim=EMBEDDING_DIM)
+        self.remote_client = None
+        self.query_batcher = None
+
+        window_ms = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+        if window_ms > 0:
+            self.query_batcher = QueryMicroBatcher(
+                lambda texts, prefix: self._compute_and_cache(texts, prefix=prefix),
+                window_ms=window_ms,
+                max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+            )
         
-        if not self.hf_token:
+        if self.hf_token:
+            self.remote_client = HuggingFaceEmbeddingClient(
+                self.api_url,
+                self.hf_token,
+                max_in_flight=int(os.getenv("HF_MAX_IN_FLIGHT", "4")),
+                max_retries=int(os.getenv("HF_MAX_RETRIES", "3")),
+                timeout=int(os.getenv("HF_TIMEOUT", "120")),
+            )
+        else:
             print("⚠️  HUGGINGFACE_API_TOKEN no está configurado, usando embeddings locales")
             self._init_local_service()
     
     def _init_local_service(self):
-        """Inicializa el servicio de embeddings local como fallback"""
+        """Inicializa el servicio de embeddings local como fallback (reutiliza el modelo compartido)"""
+        if self.local_service is not None:
+            return
         try:
             self.local_service = LocalEmbeddingService()
         except Exception as e:
@@ -37,75 +215,171 @@ class EmbeddingService:
         Returns:
             Lista de embeddings (vectores)
         """
+        return self.get_embeddings_array(texts, batch_size=batch_size, prefix=prefix).tolist()
+
+    def get_embeddings_array(self, texts: List[str], batch_size: int = 10, prefix: str = "") -> np.ndarray:
+        """
+        Igual que get_embeddings pero devuelve una matriz float32 contigua (n, dim),
+        sin crear un objeto Python por cada float. Es lo que usa la ingesta.
+        """
+        if self.cache is None:
+            return self._compute_embeddings(texts, batch_size=batch_size, prefix=prefix)
+
+        # Solo se calculan los textos que no están en cache (y cada texto distinto una sola vez)
+        keys = [self.cache.key(t, prefix) for t in texts]
+        found = {}
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in pending:
+                continue
+            vector = self.cache.get(key)
+            if vector is None:
+                pending[key] = text
+            else:
+                found[key] = vector
+
+        if pending:
+            computed = self._compute_and_cache(list(pending.values()), batch_size=batch_size, prefix=prefix)
+            found.update(zip(pending.keys(), computed))
+
+        embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, key in enumerate(keys):
+            embeddings[i] = found[key]
+        return embeddings
+
+    def _compute_and_cache(self, texts: List[str], batch_size: int = 10, prefix: str = "") -> np.ndarray:
+        """Calcula embeddings y los guarda en el cache (si está habilitado)"""
+        computed = self._compute_embeddings(texts, batch_size=batch_size, prefix=prefix)
+        if self.cache is not None:
+            self.cache.put_many([self.cache.key(t, prefix) for t in texts], computed)
+        return computed
+
+    def _compute_embeddings(self, texts: List[str], batch_size: int = 10, prefix: str = "") -> np.ndarray:
+        """Calcula embeddings sin pasar por el cache (API remota con fallback local)"""
         # Si no hay token, usar servicio local
         if prefix:
             texts = [f"{prefix}{t}" for t in texts]
         if not self.hf_token:
-            return self.local_service.get_embeddings(texts, batch_size=32)
-        
-        all_embeddings = []
-        
-        # Procesar en batches para no sobrecargar la API
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            print(f"🔄 Procesando batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
-            
-            try:
-                response = requests.post(
-                    self.api_url,
-                    headers={"Authorization": f"Bearer {self.hf_token}"},
-                    json={"inputs": batch},
-                    timeout=120
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text[:200] if response.text else "Empty response"
-                    print(f"❌ API error ({response.status_code}): {error_text}")
-                    print("🔄 Cambiando a embeddings locales...")
-                    self._init_local_service()
-                    return self.local_service.get_embeddings(texts, batch_size=32)
-                
-                batch_embeddings = response.json()
-                
-                # Si es un solo texto, viene como array directo, si son múltiples como array de arrays
-                if isinstance(batch_embeddings[0], (int, float)):
-                    all_embeddings.append(batch_embeddings)
-                else:
-                    all_embeddings.extend(batch_embeddings)
-                
-            except (requests.exceptions.RequestException, ValueError) as e:
-                print(f"⚠️  Error con API remota: {str(e)}")
-                print("🔄 Cambiando a embeddings locales...")
-                self._init_local_service()
-                return self.local_service.get_embeddings(texts, batch_size=32)
-        
-        return all_embeddings
+            return self.local_service.get_embeddings_array(texts, batch_size=32)
+
+        remote_embeddings = self.remote_client.embed(texts, batch_size=batch_size)
+
+        embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        failed = []
+        for i, emb in enumerate(remote_embeddings):
+            if emb is None:
+                failed.append(i)
+            else:
+                embeddings[i] = emb
+
+        # Solo los batches que fallaron se resuelven con el modelo local
+        if failed:
+            print(f"🔄 {len(failed)}/{len(texts)} textos fallaron en la API, usando embeddings locales...")
+            self._init_local_service()
+            embeddings[failed] = self.local_service.get_embeddings_array([texts[i] for i in failed], batch_size=32)
+
+        return embeddings
     
     def get_embedding(self, text: str, prefix: str = "") -> List[float]:
-        return self.get_embeddings([text], prefix=prefix)[0]
+        """
+        Embedding de un solo texto (ej. la query de una búsqueda).
+
+        Si el micro-batching está habilitado, las consultas concurrentes que no estén
+        en cache se agrupan en una sola llamada al modelo.
+        """
+        if self.query_batcher is None:
+            return self.get_embeddings([text], prefix=prefix)[0]
+
+        if self.cache is not None:
+            cached = self.cache.get(self.cache.key(text, prefix))
+            if cached is not None:
+                return cached.tolist()
+
+        return self.query_batcher.submit(text, prefix).tolist()
+
+    def stats(self) -> dict:
+        """Métricas del servicio para monitoreo"""
+        return {
+            'backend': 'huggingface_api' if self.hf_token else 'local',
+            'local_model': get_model_provider().stats(),
+            'cache': self.cache.stats() if self.cache else None,
+            'remote': self.remote_client.stats() if self.remote_client else None,
+            'query_batcher': self.query_batcher.stats() if self.query_batcher else None,
+        }
 
 
 # Opción alternativa: Usar modelo local (más rápido pero requiere más recursos)
 class LocalEmbeddingService:
     """Servicio para generar embeddings localmente con sentence-transformers"""
     
-    def __init__(self):
-        from sentence_transformers import SentenceTransformer
-        print("📥 Cargando modelo de embeddings localmente...")
-        self.model = SentenceTransformer('intfloat/multilingual-e5-large')
-        print("✅ Modelo cargado")
+    def __init__(self, provider: EmbeddingModelProvider = None, token_budget: int = None):
+        self.provider = provider or get_model_provider()
+        self.model = self.provider.get_model()
+        # Tokens (con padding) por forward pass: batches grandes de textos cortos, chicos de largos
+        self.token_budget = token_budget or int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192"))
     
     def get_embeddings(self, texts: List[str], batch_size: int = 32, prefix: str = "") -> List[List[float]]:
+        return self.get_embeddings_array(texts, batch_size=batch_size, prefix=prefix).tolist()
+
+    def get_embeddings_array(self, texts: List[str], batch_size: int = 32, prefix: str = "") -> np.ndarray:
+        """Embeddings como matriz float32 contigua (n, dim)"""
         if prefix:
             texts = [f"{prefix}{t}" for t in texts]
         print(f"🔄 Generando embeddings para {len(texts)} textos...")
-        embeddings = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            show_progress_bar=True,
-            convert_to_numpy=True
-        )
-        return embeddings.tolist()
+        return self._encode_bucketed(texts, max_batch_size=batch_size)
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Largo en tokens de cada texto (truncado al máximo que acepta el modelo)"""
+        max_length = self.model.max_seq_length
+        try:
+            encoded = self.model.tokenizer(
+                texts,
+                add_special_tokens=True,
+                truncation=True,
+                max_length=max_length
+            )
+            return [len(ids) for ids in encoded['input_ids']]
+        except Exception:
+            # Aproximación si el tokenizer no está disponible
+            return [min(len(t) // 4 + 2, max_length) for t in texts]
+
+    def _length_buckets(self, lengths: List[int], max_batch_size: int) -> List[List[int]]:
+        """
+        Agrupa índices ordenados por largo en tokens de modo que
+        (cantidad de textos × largo del más largo) no supere el presupuesto de tokens.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        buckets = []
+        current = []
+        for i in order:
+            # Al estar ordenado de mayor a menor, el primero del bucket define el padding
+            longest = lengths[current[0]] if current else lengths[i]
+            if current and ((len(current) + 1) * longest > self.token_budget or len(current) >= max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(i)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def _encode_bucketed(self, texts: List[str], max_batch_size: int = 32) -> np.ndarray:
+        """Codifica por buckets de largo similar y devuelve los vectores en el orden original"""
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        buckets = self._length_buckets(self._token_lengths(texts), max_batch_size)
+        embeddings = None
+        for bucket in buckets:
+            encoded = self.model.encode(
+                [texts[i] for i in bucket],
+                batch_size=len(bucket),
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            embeddings[bucket] = encoded
+        return embeddings
     
     def get_embedding(self, text: str, prefix: str = "") -> List[float]:
         return self.get_embeddings([text], prefix=prefix)[0]
\ No newline at end of file
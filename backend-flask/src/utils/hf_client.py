@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30
+
+
+class HuggingFaceEmbeddingClient:
+    """
+    Cliente concurrente para la API de inferencia de HuggingFace.
+
+    Reutiliza conexiones keep-alive (una sesión con pool), envía varios batches en paralelo
+    y reintenta 429/5xx respetando Retry-After. Los batches que fallan definitivamente se
+    devuelven como None para que el llamador los resuelva con el modelo local.
+    """
+
+    def __init__(self, api_url: str, token: str, max_in_flight: int = 4,
+                 max_retries: int = 3, timeout: int = 120):
+        self.api_url = api_url
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="hf-embeddings"
+        )
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+        self.failed_batches = 0
+
+    def embed(self, texts: List[str], batch_size: int = 10) -> List[List[float] | None]:
+        """
+        Embedea los textos en batches concurrentes.
+
+        Returns:
+            Una entrada por texto: el vector, o None si su batch falló
+        """
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        print(f"🔄 Enviando {len(batches)} batches a HuggingFace ({self.max_in_flight} en paralelo)")
+
+        results = []
+        for batch, batch_result in zip(batches, self._executor.map(self._embed_batch, batches)):
+            results.extend(batch_result if batch_result is not None else [None] * len(batch))
+        return results
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]] | None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._stats_lock:
+                    self.requests_sent += 1
+                response = self.session.post(
+                    self.api_url,
+                    json={"inputs": batch},
+                    timeout=self.timeout
+                )
+
+                if response.status_code == 200:
+                    batch_embeddings = response.json()
+                    # Si es un solo texto, viene como array directo, si son múltiples como array de arrays
+                    if batch_embeddings and isinstance(batch_embeddings[0], (int, float)):
+                        batch_embeddings = [batch_embeddings]
+                    if len(batch_embeddings) != len(batch):
+                        raise ValueError(
+                            f"La API devolvió {len(batch_embeddings)} vectores para {len(batch)} textos"
+                        )
+                    return batch_embeddings
+
+                error_text = response.text[:200] if response.text else "Empty response"
+                print(f"❌ API error ({response.status_code}): {error_text}")
+                if response.status_code not in RETRYABLE_STATUS:
+                    break
+                delay = self._retry_after(response) or self._backoff(attempt)
+
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"⚠️  Error con API remota: {str(e)}")
+                delay = self._backoff(attempt)
+
+            if attempt < self.max_retries:
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+        with self._stats_lock:
+            self.failed_batches += 1
+        return None
+
+    @staticmethod
+    def _retry_after(response) -> float | None:
+        """Segundos a esperar según el header Retry-After (segundos o fecha HTTP)"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(seconds, 0.0), MAX_BACKOFF_SECONDS)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Backoff exponencial con jitter"""
+        return min(2 ** attempt + random.uniform(0, 0.5), MAX_BACKOFF_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            'max_in_flight': self.max_in_flight,
+            'requests_sent': self.requests_sent,
+            'retries': self.retries,
+            'failed_batches': self.failed_batches,
+        }
@@ -0,0 +1,287 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from src.utils.embedding_workers import embed_passages
+from src.utils.metrics import current_rss_bytes
+from src.utils.pdf_chunker import iter_pdf_documents, process_pdf_file
+from src.utils.qdrant_service import InsertResult, is_indexable
+
+# Últimas ingestas (se muestran en /status/api/metrics)
+_recent_ingests = deque(maxlen=20)
+_DONE = object()
+
+
+def document_metadata(doc, filename: str) -> Dict:
+    """Metadata de un Document que se guarda en cada chunk"""
+    return {
+        'document_id': doc.id,
+        'title': doc.title or filename,
+        'description': doc.description,
+        'uploaded_by': doc.uploaded_by,
+        'filename': filename
+    }
+
+
+def embed_titles(chunks) -> np.ndarray:
+    """Embeddings del vector "title": una vez por jerarquía distinta (muchos chunks la comparten)"""
+    jerarquias = [
+        chunk['metadata'].get('section_hierarchy') or chunk['metadata'].get('section_title', '')
+        for chunk in chunks
+    ]
+    unicas = list(dict.fromkeys(jerarquias))
+    posicion = {jerarquia: i for i, jerarquia in enumerate(unicas)}
+    return embed_passages(unicas)[[posicion[j] for j in jerarquias]]
+
+
+@dataclass
+class IngestResult(InsertResult):
+    """Resultado de la ingesta de un PDF: lo insertado más cuándo quedó indexado el primer chunk y la memoria"""
+    filename: str = ''
+    chunks_total: int = 0
+    batches: int = 0
+    time_to_first_chunk_seconds: float | None = None
+    embed_seconds: float = 0.0
+    rss_start_bytes: int | None = None
+    peak_rss_bytes: int | None = None
+
+    def sample_rss(self):
+        rss = current_rss_bytes()
+        if rss is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+
+    def summary(self) -> dict:
+        data = asdict(self)
+        data.pop('batch_seconds')
+        return data
+
+
+def recent_ingests() -> List[dict]:
+    return list(_recent_ingests)
+
+
+def index_pdf(pdf_path: str, metadata: Dict, qdrant_service, batch_size: int = None,
+              queue_batches: int = None) -> IngestResult:
+    """
+    Chunking estructurado + embeddings + inserción de un PDF en la colección del servicio,
+    como pipeline: un thread convierte y divide el PDF y deja batches de chunks en una cola
+    acotada (INGEST_QUEUE_BATCHES); acá se generan los embeddings de cada batch mientras el
+    anterior se sube a Qdrant. Así las tres etapas se solapan y en memoria solo hay unos
+    pocos batches, no el documento entero con todos sus vectores.
+
+    Si algo falla se borran los chunks del documento que ya se habían subido.
+    """
+    batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    queue_batches = queue_batches or int(os.getenv("INGEST_QUEUE_BATCHES", "2"))
+    result = IngestResult(filename=os.path.basename(pdf_path), rss_start_bytes=current_rss_bytes())
+    start = time.perf_counter()
+
+    batches = queue.Queue(maxsize=queue_batches)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Espera lugar en la cola (backpressure) salvo que el consumidor haya abortado
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            batch = []
+            for chunk in iter_pdf_documents(pdf_path, metadata):
+                result.chunks_total += 1
+                if not is_indexable(chunk):
+                    result.skipped_short += 1
+                    continue
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    def upload(chunks, embeddings, title_embeddings):
+        # Se devuelve también cuándo terminó: collect() corre recién después de embeber el batch siguiente
+        batch_result = qdrant_service.insert_chunks(
+            chunks, embeddings, batch_size=100, title_embeddings=title_embeddings
+        )
+        return batch_result, time.perf_counter()
+
+    def collect(uploaded):
+        batch_result, finished_at = uploaded
+        if batch_result.error:
+            raise RuntimeError(batch_result.error)
+        result.points_written += batch_result.points_written
+        result.batch_seconds.extend(batch_result.batch_seconds)
+        if result.time_to_first_chunk_seconds is None:
+            result.time_to_first_chunk_seconds = finished_at - start
+            print(f"⏱️ Primer chunk indexado a los {result.time_to_first_chunk_seconds:.2f}s")
+
+    producer = threading.Thread(target=produce, name="ingest-parse", daemon=True)
+    # Un solo upload en vuelo: el siguiente batch se embebe mientras tanto
+    uploader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upload")
+    pending = None
+    producer.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            embed_start = time.perf_counter()
+            embeddings = embed_passages([chunk['text'] for chunk in item])
+            title_embeddings = embed_titles(item) if qdrant_service.has_title_vector else None
+            result.embed_seconds += time.perf_counter() - embed_start
+            result.batches += 1
+            result.sample_rss()
+
+            if pending is not None:
+                collect(pending.result())
+            pending = uploader.submit(upload, item, embeddings, title_embeddings)
+
+        if pending is not None:
+            collect(pending.result())
+            pending = None
+        if not result.points_written:
+            raise RuntimeError("No hay puntos válidos para insertar")
+
+        # total_chunks recién se conoce al final de la conversión
+        if metadata.get('document_id') is not None:
+            qdrant_service.set_total_chunks(metadata['document_id'], result.chunks_total)
+
+    except Exception as e:
+        result.error = str(e)
+        print(f"❌ Error en la ingesta de {result.filename}: {e}")
+    finally:
+        stop.set()
+        if pending is not None:
+            # El upload en vuelo tiene que terminar antes de limpiar: si no, aterriza después del borrado
+            try:
+                pending.result()
+            except Exception:
+                pass
+        uploader.shutdown(wait=True)
+        producer.join()
+        result.sample_rss()
+
+    # points_written solo cuenta los batches ya recolectados: puede haber subidos que no sume
+    if result.error and metadata.get('document_id') is not None:
+        qdrant_service.delete_by_document_id(metadata['document_id'])
+    qdrant_service.flush()
+    result.elapsed_seconds = time.perf_counter() - start
+
+    peak_mb = f"{result.peak_rss_bytes / 1024 ** 2:.0f} MB" if result.peak_rss_bytes else "?"
+    print(f"📊 {result.filename}: {result.points_written}/{result.chunks_total} chunks en {result.batches} "
+          f"batches, {result.elapsed_seconds:.2f}s (embeddings {result.embed_seconds:.2f}s), pico RSS {peak_mb}")
+    _recent_ingests.append(result.summary())
+    return result
+
+
+@dataclass
+class UpdateResult:
+    """Resultado de actualizar un documento contra los chunks que ya tiene en la colección"""
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    skipped_short: int = 0
+    embed_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def summary(self) -> dict:
+        return asdict(self)
+
+
+def update_pdf(pdf_path: str, metadata: Dict, qdrant_service) -> UpdateResult:
+    """
+    Re-ingesta incremental de una versión corregida del PDF de un documento.
+
+    Los ids de los chunks dependen del documento y de su contenido, no de su posición
+    (ver stable_chunk_id), así que se compara el conjunto nuevo con el que está en la
+    colección: solo los chunks nuevos o modificados pasan por embeddings, a los que solo
+    cambiaron de lugar (chunk_index, total_chunks, datos del documento) se les actualiza
+    la metadata y los que ya no están se borran.
+
+    Se inserta antes de borrar, así las búsquedas nunca ven el documento vacío. Los
+    documentos indexados con los ids anteriores se reemplazan completos la primera vez.
+    """
+    result = UpdateResult()
+    start = time.perf_counter()
+    document_id = metadata['document_id']
+    inserted = []
+
+    try:
+        chunks = process_pdf_file(pdf_path, metadata=metadata)
+        indexable = [chunk for chunk in chunks if is_indexable(chunk)]
+        result.skipped_short = len(chunks) - len(indexable)
+        existing = qdrant_service.get_chunk_metadata(document_id)
+
+        new = [chunk for chunk in indexable if chunk['id'] not in existing]
+        updates = {}
+        for chunk in indexable:
+            stored = existing.get(chunk['id'])
+            if stored is None:
+                continue
+            # 'ingesta' queda con la fecha en que se generó el embedding
+            changed = {
+                key: value for key, value in chunk['metadata'].items()
+                if key != 'ingesta' and stored.get(key) != value
+            }
+            if changed:
+                updates[chunk['id']] = changed
+        current_ids = {chunk['id'] for chunk in indexable}
+        removed = [point_id for point_id in existing if point_id not in current_ids]
+        print(f"🔍 Documento {document_id}: {len(new)} chunks nuevos, {len(updates)} a actualizar, "
+              f"{len(removed)} a borrar, {len(indexable) - len(new) - len(updates)} sin cambios")
+
+        if new:
+            embed_start = time.perf_counter()
+            embeddings = embed_passages([chunk['text'] for chunk in new])
+            title_embeddings = embed_titles(new) if qdrant_service.has_title_vector else None
+            result.embed_seconds = time.perf_counter() - embed_start
+            inserted = [chunk['id'] for chunk in new]
+            insert = qdrant_service.insert_chunks(new, embeddings, batch_size=100, title_embeddings=title_embeddings)
+            if insert.error:
+                raise RuntimeError(insert.error)
+        if updates:
+            qdrant_service.update_metadata(updates)
+        if removed:
+            qdrant_service.delete_points(removed)
+
+        result.added, result.updated, result.deleted = len(new), len(updates), len(removed)
+        result.unchanged = len(indexable) - len(new) - len(updates)
+
+    except Exception as e:
+        result.error = str(e)
+        print(f"❌ Error actualizando el documento {document_id}: {e}")
+        if inserted:
+            # Los chunks anteriores siguen en la colección: se descarta lo agregado a medias
+            qdrant_service.delete_points(inserted)
+    qdrant_service.flush()
+
+    result.elapsed_seconds = time.perf_counter() - start
+    print(f"📊 Documento {document_id} actualizado en {result.elapsed_seconds:.2f}s "
+          f"(embeddings {result.embed_seconds:.2f}s)")
+    return result
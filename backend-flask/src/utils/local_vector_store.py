@@ -0,0 +1,371 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from src.utils.pdf_chunker import section_base as base_of
+from src.utils.qdrant_service import ExpansionResult, InsertResult, is_indexable, merge_windows
+
+
+# Apunta a los archivos de la última versión guardada completa (ver _save)
+MANIFEST = "manifest.json"
+
+
+def _as_index(value) -> int:
+    return value if isinstance(value, int) else -1
+
+
+class LocalVectorStore:
+    """
+    Vector store en proceso con la misma interfaz que QdrantService.
+
+    Los vectores viven en una matriz float32 contigua (normalizados, así el coseno es un
+    producto punto) y document_id / chunk_index en arrays paralelos, de modo que la búsqueda
+    filtrada y el top-k son operaciones vectorizadas. Con `path` se persiste en disco con
+    flush() y al abrirse la matriz se mapea en memoria (copy-on-write).
+
+    Sirve de reemplazo sin servidor para CI / desarrollo (VECTOR_STORE=local) y como línea
+    base en los benchmarks de latencia.
+    """
+
+    def __init__(self, path: str = None, dim: int = 1024, collection_name: str = "docs"):
+        self.dim = dim
+        self.collection_name = collection_name
+        self.path = Path(path) if path else None
+
+        self._lock = threading.RLock()
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._alive = np.empty(0, dtype=bool)
+        self._document_ids = np.empty(0, dtype=np.int64)
+        self._chunk_indices = np.empty(0, dtype=np.int64)
+        self._ids = []
+        self._payloads = []
+        self._rows = {}
+        self._dirty = False
+        self._version = 0
+
+        if self.path and ((self.path / MANIFEST).exists() or (self.path / "vectors.npy").exists()):
+            self._load()
+        if self.path:
+            # Red de seguridad: lo no guardado con flush() se escribe al terminar el proceso
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv("VECTOR_STORE_PATH") or None)
+
+    # ------------------------------------------------------------------ interfaz de QdrantService
+
+    @property
+    def is_bootstrapped(self) -> bool:
+        return True
+
+    def ensure_bootstrapped(self) -> bool:
+        return True
+
+    def ensure_payload_indexes(self) -> List[str]:
+        return []
+
+    @property
+    def has_sparse_vectors(self) -> bool:
+        return False
+
+    @property
+    def has_title_vector(self) -> bool:
+        return False
+
+    def stats(self) -> dict:
+        return {
+            'points': int(self._alive[:self._size].sum()),
+            'capacity': len(self._vectors),
+            'size_mb': round(self._vectors.nbytes / 1024 ** 2, 1),
+        }
+
+    def insert_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray | List[List[float]],
+                      batch_size: int = 100, parallel: int = None,
+                      title_embeddings: np.ndarray = None) -> InsertResult:
+        """Inserta (o reemplaza por id) chunks con sus embeddings; el resto de los argumentos se ignora"""
+        result = InsertResult()
+        start = time.perf_counter()
+        if len(chunks) != len(embeddings):
+            result.error = f"Número de chunks ({len(chunks)}) no coincide con embeddings ({len(embeddings)})"
+            return result
+
+        valid_rows = []
+        for row, chunk in enumerate(chunks):
+            if not is_indexable(chunk):
+                result.skipped_short += 1
+                continue
+            valid_rows.append(row)
+        if not valid_rows:
+            result.error = "No hay puntos válidos para insertar"
+            return result
+
+        vectors = np.asarray(embeddings, dtype=np.float32)[valid_rows]
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self._reserve(self._size + len(valid_rows))
+            for vector, row in zip(vectors, valid_rows):
+                chunk = chunks[row]
+                metadata = chunk['metadata']
+                payload = {
+                    'pageContent': chunk.get('pageContent', chunk.get('text', '')),
+                    'metadata': metadata
+                }
+                position = self._rows.get(chunk['id'])
+                if position is None:
+                    position = self._size
+                    self._size += 1
+                    self._ids.append(chunk['id'])
+                    self._payloads.append(payload)
+                    self._rows[chunk['id']] = position
+                else:
+                    self._payloads[position] = payload
+                self._vectors[position] = vector
+                self._alive[position] = True
+                self._document_ids[position] = _as_index(metadata.get('document_id'))
+                self._chunk_indices[position] = _as_index(metadata.get('chunk_index'))
+            self._dirty = True
+
+        result.points_written = len(valid_rows)
+        result.batch_seconds.append(time.perf_counter() - start)
+        result.elapsed_seconds = time.perf_counter() - start
+        return result
+
+    def delete_by_document_id(self, document_id: int) -> bool:
+        with self._lock:
+            rows = np.flatnonzero(self._mask(document_id))
+            self._alive[rows] = False
+            for row in rows:
+                self._rows.pop(self._ids[row], None)
+            self._dirty = True
+        return True
+
+    def get_chunk_metadata(self, document_id: int) -> Dict[str, Dict]:
+        return {self._ids[row]: dict(self._payloads[row]['metadata']) for row in np.flatnonzero(self._mask(document_id))}
+
+    def update_metadata(self, updates: Dict[str, Dict], batch_size: int = 256):
+        with self._lock:
+            for point_id, fields in updates.items():
+                row = self._rows.get(point_id)
+                if row is not None:
+                    self._payloads[row]['metadata'].update(fields)
+                    if 'chunk_index' in fields:
+                        self._chunk_indices[row] = _as_index(fields['chunk_index'])
+            self._dirty = True
+
+    def delete_points(self, ids: List[str]):
+        with self._lock:
+            for point_id in ids:
+                row = self._rows.pop(point_id, None)
+                if row is not None:
+                    self._alive[row] = False
+            self._dirty = True
+
+    def set_total_chunks(self, document_id: int, total: int):
+        with self._lock:
+            for row in np.flatnonzero(self._mask(document_id)):
+                self._payloads[row]['metadata']['total_chunks'] = total
+            self._dirty = True
+
+    def search_similar(self, query_vector: List[float], limit: int = 5, document_id: int = None,
+                       hnsw_ef: int = None, exact: bool = None, query_text: str = None,
+                       mode: str = None) -> List[Dict]:
+        """Top-k exacto por coseno (los parámetros de HNSW e híbrida no aplican)"""
+        with self._lock:
+            # Filas y vectores del mismo estado: una inserción concurrente reemplaza las matrices
+            rows = np.flatnonzero(self._mask(document_id))
+            candidates = self._vectors[rows]
+        if len(rows) == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = candidates @ query
+
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._to_chunk(rows[i], score=float(scores[i])) for i in top]
+
+    def iter_chunks_by_document(self, document_id: int, page_size: int = 100) -> Iterator[Dict]:
+        for row in self._ordered(self._mask(document_id)):
+            yield self._to_chunk(row)
+
+    def get_chunks_by_document(self, document_id: int, limit: int = None) -> List[Dict]:
+        return list(self.iter_chunks_by_document(document_id))[:limit]
+
+    def count_chunks(self, document_id: int) -> int:
+        return int(self._mask(document_id).sum())
+
+    def get_last_chunk_index(self, document_id: int) -> int | None:
+        mask = self._mask(document_id)
+        return int(self._chunk_indices[:self._size][mask].max()) if mask.any() else None
+
+    def get_chunks_page(self, document_id: int, page: int = 1, per_page: int = 50) -> List[Dict]:
+        first = (page - 1) * per_page
+        mask = self._mask(document_id, chunk_range=(first, first + per_page - 1))
+        return [self._to_chunk(row) for row in self._ordered(mask)]
+
+    def get_sample_payloads(self, document_id: int = None, limit: int = 5) -> List[Dict]:
+        samples = []
+        for row in np.flatnonzero(self._mask(document_id))[:limit]:
+            page_content = self._payloads[row].get('pageContent', '')
+            samples.append({
+                'id': self._ids[row],
+                'payload': {
+                    'pageContent': page_content[:250] + "..." if len(page_content) > 250 else page_content,
+                    'metadata': self._payloads[row].get('metadata', {})
+                }
+            })
+        return samples
+
+    def get_chunks_by_sections(self, sections: Iterable[Tuple[int, str]], page_size: int = 256) -> ExpansionResult:
+        started = time.perf_counter()
+        result = ExpansionResult(groups={key: [] for key in dict.fromkeys(sections)})
+        for document_id, section_base in result.groups:
+            result.groups[(document_id, section_base)] = self.get_chunks_by_section(section_base, document_id)
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def get_chunk_windows(self, positions: Iterable[Tuple[int, int]], k: int = 1,
+                          page_size: int = 256) -> ExpansionResult:
+        started = time.perf_counter()
+        result = ExpansionResult()
+        for document_id, start, end in merge_windows(positions, k):
+            mask = self._mask(document_id, chunk_range=(start, end))
+            result.groups[(document_id, start, end)] = [self._to_chunk(row) for row in self._ordered(mask)]
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def get_chunks_by_section(self, section_base: str, document_id: int,
+                              expansion: ExpansionResult = None) -> List[Dict]:
+        # En memoria no hay idas y vueltas: expansion no se toca
+        return [
+            self._to_chunk(row, score=1.0)
+            for row in self._ordered(self._mask(document_id))
+            if (self._payloads[row]['metadata'].get('section_base')
+                or base_of(self._payloads[row]['metadata'].get('section_title', ''))) == section_base
+        ]
+
+    # ------------------------------------------------------------------ internos
+
+    def _mask(self, document_id: int = None, chunk_range: Tuple[int, int] = None) -> np.ndarray:
+        # Con el lock: _reserve reemplaza los arrays y la inserción mueve _size
+        with self._lock:
+            mask = self._alive[:self._size].copy()
+            if document_id:
+                mask &= self._document_ids[:self._size] == document_id
+            if chunk_range is not None:
+                indices = self._chunk_indices[:self._size]
+                mask &= (indices >= chunk_range[0]) & (indices <= chunk_range[1])
+            return mask
+
+    def _ordered(self, mask: np.ndarray) -> np.ndarray:
+        rows = np.flatnonzero(mask)
+        return rows[np.argsort(self._chunk_indices[rows], kind='stable')]
+
+    def _to_chunk(self, row: int, score: float = None) -> Dict:
+        payload = self._payloads[row]
+        chunk = {
+            'id': self._ids[row],
+            'payload': {
+                'pageContent': payload.get('pageContent', ''),
+                **payload.get('metadata', {})
+            }
+        }
+        if score is not None:
+            chunk['score'] = score
+        return chunk
+
+    def _reserve(self, size: int):
+        """Crece por duplicación para que insertar de a poco no copie la matriz cada vez"""
+        if size <= len(self._vectors):
+            return
+        capacity = max(size, 2 * len(self._vectors), 1024)
+
+        def grow(array, fill):
+            grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            return grown
+
+        self._vectors = grow(self._vectors, 0)
+        self._alive = grow(self._alive, False)
+        self._document_ids = grow(self._document_ids, -1)
+        self._chunk_indices = grow(self._chunk_indices, -1)
+
+    def flush(self):
+        """
+        Persiste en disco los cambios pendientes. Las escrituras solo marcan el store como
+        modificado: reescribir la matriz y los payloads es O(N), así que se hace una vez al
+        final de cada ingesta/actualización/borrado y no en cada batch.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def _save(self):
+        """
+        Escribe vectores y payloads como una versión nueva y recién entonces reemplaza el
+        manifest (rename atómico) para que apunte a ella: si el proceso muere a mitad de
+        camino, queda la versión anterior completa.
+        """
+        if not self.path:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        version = self._version + 1
+        files = {'vectors': f"vectors.{version}.npy", 'points': f"points.{version}.json"}
+        # Solo las filas vivas: los borrados se compactan al guardar
+        rows = np.flatnonzero(self._alive[:self._size])
+        np.save(self.path / files['vectors'], self._vectors[rows])
+        with open(self.path / files['points'], 'w', encoding='utf-8') as f:
+            json.dump({
+                'dim': self.dim,
+                'ids': [self._ids[row] for row in rows],
+                'payloads': [self._payloads[row] for row in rows],
+            }, f, ensure_ascii=False)
+
+        tmp = self.path / f"{MANIFEST}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, **files}, f)
+        os.replace(tmp, self.path / MANIFEST)
+        self._version = version
+
+        # Versiones anteriores (y el formato sin manifest); la matriz mapeada sigue válida en Linux
+        for old in [*self.path.glob("vectors*.npy"), *self.path.glob("points*.json")]:
+            if old.name not in files.values():
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def _load(self):
+        files = {'vectors': "vectors.npy", 'points': "points.json"}
+        if (self.path / MANIFEST).exists():
+            with open(self.path / MANIFEST, encoding='utf-8') as f:
+                manifest = json.load(f)
+            self._version = manifest['version']
+            files = {'vectors': manifest['vectors'], 'points': manifest['points']}
+        with open(self.path / files['points'], encoding='utf-8') as f:
+            points = json.load(f)
+        # Copy-on-write: las páginas se leen del archivo hasta que se modifican
+        self._vectors = np.load(self.path / files['vectors'], mmap_mode='c')
+        self.dim = points['dim']
+        self._ids = points['ids']
+        self._payloads = points['payloads']
+        self._size = len(self._ids)
+        self._rows = {point_id: row for row, point_id in enumerate(self._ids)}
+        self._alive = np.ones(self._size, dtype=bool)
+        self._document_ids = np.array(
+            [_as_index(p['metadata'].get('document_id')) for p in self._payloads], dtype=np.int64
+        )
+        self._chunk_indices = np.array(
+            [_as_index(p['metadata'].get('chunk_index')) for p in self._payloads], dtype=np.int64
+        )
@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pymupdf
+import pymupdf4llm
+
+from src.utils.pdf_markdown import iter_pdf_markdown
+
+# Cambia con la versión del conversor: entradas de otra versión no se reutilizan
+CONVERTER_VERSION = f"pymupdf4llm-{pymupdf4llm.__version__}_pymupdf-{pymupdf.VersionBind}"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MarkdownCache:
+    """
+    Cache en disco del Markdown de cada PDF, direccionado por contenido.
+
+    La clave es el SHA-256 del archivo dentro de un directorio por versión del conversor,
+    y el Markdown se guarda comprimido con gzip (se puede mirar con `zcat`). Volver a
+    dividir en chunks un PDF ya convertido (otro max_chunk_size, otras heurísticas de
+    encabezados, una reindexación) no vuelve a pasar por pymupdf4llm.
+    """
+
+    def __init__(self, cache_dir: str, converter_version: str = CONVERTER_VERSION):
+        self.root = Path(cache_dir)
+        self.path = self.root / converter_version
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Crea el cache según variables de entorno, o None si está deshabilitado"""
+        if os.getenv("MARKDOWN_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        cache_dir = os.getenv("MARKDOWN_CACHE_DIR", os.path.join(os.getcwd(), 'data', 'cache', 'markdown'))
+        try:
+            return cls(cache_dir)
+        except OSError as e:
+            print(f"⚠️ No se pudo abrir el cache de Markdown, se continúa sin cache: {e}")
+            return None
+
+    def _entry(self, digest: str) -> Path:
+        return self.path / f"{digest}.md.gz"
+
+    def get(self, digest: str) -> str | None:
+        try:
+            with gzip.open(self._entry(digest), 'rt', encoding='utf-8') as f:
+                md_text = f.read()
+        except (OSError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return md_text
+
+    def put(self, digest: str, md_text: str):
+        # Archivo temporal + rename: un lector nunca ve una entrada a medio escribir
+        tmp = self.path / f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(md_text)
+        os.replace(tmp, self._entry(digest))
+
+    def evict(self, pdf_path: str) -> int:
+        """Borra las entradas del PDF (de cualquier versión del conversor); devuelve cuántas"""
+        digest = file_sha256(pdf_path)
+        removed = 0
+        for entry in self.root.glob(f"*/{digest}.md.gz"):
+            entry.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        entries = list(self.path.glob("*.md.gz"))
+        lookups = self.hits + self.misses
+        return {
+            'converter_version': self.path.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'entries': len(entries),
+            'size_mb': round(sum(entry.stat().st_size for entry in entries) / 1024 ** 2, 2),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_markdown_cache() -> MarkdownCache | None:
+    """Cache compartido del proceso, o None si MARKDOWN_CACHE_ENABLED=false"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MarkdownCache.from_env() or False
+    return _cache or None
+
+
+def iter_markdown(pdf_path: str) -> Iterator[str]:
+    """
+    Markdown de un PDF por fragmentos: del cache si ya se convirtió, o convertido en
+    streaming (iter_pdf_markdown) y guardado en el cache al terminar la conversión.
+    """
+    cache = get_markdown_cache()
+    if cache is None:
+        yield from iter_pdf_markdown(pdf_path)
+        return
+
+    digest = file_sha256(pdf_path)
+    md_text = cache.get(digest)
+    if md_text is not None:
+        print(f"♻️ Markdown de {Path(pdf_path).name} desde el cache")
+        yield md_text
+        return
+
+    pieces = []
+    for piece in iter_pdf_markdown(pdf_path):
+        pieces.append(piece)
+        yield piece
+    try:
+        cache.put(digest, ''.join(pieces))
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el Markdown en el cache: {e}")
+
+
+def markdown_for(pdf_path: str) -> str:
+    """Markdown completo de un PDF, usando el cache"""
+    return ''.join(iter_markdown(pdf_path))
+
+
+def evict_markdown(pdf_path: str) -> int:
+    """Quita del cache el Markdown de un PDF (al borrar su Document)"""
+    cache = get_markdown_cache()
+    if cache is None or not pdf_path or not os.path.exists(pdf_path):
+        return 0
+    return cache.evict(pdf_path)
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def current_rss_bytes() -> int | None:
+    """Memoria residente (RSS) actual del proceso en bytes, o None si no se puede medir"""
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # En Linux ru_maxrss viene en KB (es el pico, no el actual, pero sirve de aproximación)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+class LatencyStats:
+    """Acumula latencias en ms; los percentiles se calculan sobre las últimas `window` muestras"""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record((time.perf_counter() - start) * 1000)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total_ms, max_ms = self.count, self.total_ms, self.max_ms
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': count,
+            'avg_ms': round(total_ms / count, 2),
+            'p50_ms': round(samples[len(samples) // 2], 2),
+            'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            'max_ms': round(max_ms, 2),
+        }
+
+
+class Histogram:
+    """Histograma de valores enteros en buckets de potencias de 2 (1, 2, 4, 8, ...)"""
+
+    def __init__(self, max_bucket: int = 64):
+        self._bounds = [1]
+        while self._bounds[-1] < max_bucket:
+            self._bounds.append(self._bounds[-1] * 2)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, value: int):
+        idx = next((i for i, bound in enumerate(self._bounds) if value <= bound), len(self._bounds))
+        with self._lock:
+            self._counts[idx] += 1
+
+    def summary(self) -> dict:
+        labels = [f"<={b}" for b in self._bounds] + [f">{self._bounds[-1]}"]
+        with self._lock:
+            return {label: count for label, count in zip(labels, self._counts) if count}
@@ -1,9 +1,48 @@
-import pymupdf4llm
 import json
 from datetime import datetime
 from pathlib import Path
 import hashlib
 import re
+import uuid
+
+from src.utils.markdown_cache import iter_markdown, markdown_for
+
+PART_SUFFIX_RE = re.compile(r'^(.+?)\s*\(parte \d+\)$')
+
+# Clasificador de encabezados: patrones compilados una vez (se evalúan en cada línea)
+MD_HEADER_RE = re.compile(r'^(#{1,6})\s+(.+)$')
+BOLD_STAR_RE = re.compile(r'^\s*_?\s*\*\*(.+?)\*\*\s*_?\s*$')
+BOLD_UNDERSCORE_RE = re.compile(r'^\s*_?\s*__(.+?)__\s*_?\s*$')
+FOOTER_RE = re.compile(
+    r'\btel\.?\s*[:\(]|\bwww\.|\.(com|edu|ar)\b'
+    r'|\bc\.?\s*p\.?\s*\d+|calle\s+\d+|república\s+argentina'
+)
+FOOTER_DIGITS_RE = re.compile(r'\d{4,}')
+NUMBERED_RE = re.compile(r'^\s*(?:\d+[.)]|[IVXLCDM]+\))\s+\S')
+UNDERLINE_TAG_RE = re.compile(r'</?u>')
+EMPHASIS_START = frozenset('_*')
+
+
+def chunk_content_hash(hierarchy: str, content: str) -> str:
+    """SHA-256 de lo que se embebe de un chunk: jerarquía de la sección + contenido"""
+    return hashlib.sha256(f"{hierarchy}\n{content}".encode('utf-8')).hexdigest()
+
+
+def stable_chunk_id(namespace, content_hash: str, occurrence: int = 0) -> str:
+    """
+    Id (UUID) del punto en Qdrant a partir del documento y del contenido del chunk, no de
+    su posición: agregar un párrafo arriba no cambia los ids del resto. `occurrence`
+    distingue chunks idénticos repetidos dentro del mismo documento.
+    """
+    digest = hashlib.sha256(f"{namespace}\0{content_hash}\0{occurrence}".encode('utf-8')).digest()
+    return str(uuid.UUID(bytes=digest[:16]))
+
+
+def section_base(title: str) -> str:
+    """Título de la sección sin el sufijo "(parte N)" que agrega la división de secciones grandes"""
+    match = PART_SUFFIX_RE.match(title or '')
+    return match.group(1).strip() if match else (title or '').strip()
+
 
 class PDFChunker:
     def __init__(self, max_chunk_size=1500, overlap=200):
@@ -15,26 +54,38 @@ class PDFChunker:
         
         print(f"📄 Convirtiendo {pdf_path} a Markdown...")
         try:
-            md_text = pymupdf4llm.to_markdown(pdf_path)
+            md_text = markdown_for(pdf_path)
         except Exception as e:
             print(f"❌ Error al convertir PDF: {e}")
             raise
         
-        # Guardar markdown para debug (opcional)
-        debug_folder = Path(pdf_path).parent / 'debug'
-        debug_folder.mkdir(exist_ok=True)
-        md_file = debug_folder / f"{Path(pdf_path).stem}_debug.md"
-        with open(md_file, 'w', encoding='utf-8') as f:
-            f.write(md_text)
-        print(f"✓ Markdown guardado en {md_file}")
-        
         print("✂️  Dividiendo por secciones...")
-        chunks = self._split_by_sections(md_text)
+        chunks = list(self._split_by_sections(md_text))
         
         print(f"📦 Preparando {len(chunks)} chunks...")
         documents = self._prepare_for_qdrant(chunks, pdf_path, metadata)
         
         return documents
+
+    def iter_documents(self, pdf_path, metadata=None):
+        """
+        Versión en streaming de process_pdf: convierte el PDF por rangos de páginas y va
+        devolviendo los chunks listos para Qdrant mientras el resto todavía se convierte.
+        'total_chunks' no se conoce hasta el final, por eso queda fuera de la metadata.
+        """
+        print(f"📄 Convirtiendo {pdf_path} a Markdown (streaming)...")
+        lines = self._iter_lines(iter_markdown(pdf_path))
+        yield from self._iter_prepared(self._split_by_sections(lines), pdf_path, metadata)
+
+    @staticmethod
+    def _iter_lines(pieces):
+        """Líneas completas de una secuencia de fragmentos de Markdown (una línea puede quedar partida entre dos)"""
+        pending = ''
+        for piece in pieces:
+            lines = (pending + piece).split('\n')
+            pending = lines.pop()
+            yield from lines
+        yield pending
     
     def _is_footer(self, title: str) -> bool:
         """True si el texto parece un pie de página (dirección, teléfono, web), no un título de sección."""
@@ -42,30 +93,25 @@ class PDFChunker:
             return True
         t = title.lower().strip()
         # Patrones típicos de footers
-        if re.search(r'\btel\.?\s*[:\(]|\bwww\.|\.(com|edu|ar)\b', t):
+        if FOOTER_RE.search(t):
             return True
-        if re.search(r'\bc\.?\s*p\.?\s*\d+|calle\s+\d+|república\s+argentina', t):
-            return True
-        if '|' in t and (re.search(r'\d{4,}', t) or 'la plata' in t or 'c.p.' in t):
+        if '|' in t and (FOOTER_DIGITS_RE.search(t) or 'la plata' in t or 'c.p.' in t):
             return True
         return False
 
     def _is_all_caps_heading(self, title: str) -> bool:
         """Heurística: título en MAYÚSCULAS (ignora dígitos/signos)."""
-        letters = [c for c in (title or "") if c.isalpha()]
-        if len(letters) < 4:
+        title = title or ""
+        # upper() sin cambios alcanza casi siempre; si cambia algo se mira letra por letra
+        if title != title.upper() and any(c.isalpha() and c != c.upper() for c in title):
             return False
-        return all(c == c.upper() for c in letters)
+        return sum(map(str.isalpha, title)) >= 4
 
     def _looks_like_numbered_subheading(self, title: str) -> bool:
         """Ej: '1) Introducción', '2) Procesos y Scheduling', 'III) ...'."""
         if not title:
             return False
-        return bool(
-            re.match(r'^\s*\d+\)\s+\S', title)
-            or re.match(r'^\s*\d+\.\s+\S', title)
-            or re.match(r'^\s*[IVXLCDM]+\)\s+\S', title)
-        )
+        return NUMBERED_RE.match(title) is not None
 
     def _extract_full_emphasis_title(self, line: str) -> str | None:
         """
@@ -79,12 +125,15 @@ class PDFChunker:
         if line is None:
             return None
         s = line.strip()
+        # Tiene que empezar con _ o * y terminar con _ o *: el resto de las líneas no llega a la regex
+        if not s or s[0] not in '_*' or s[-1] not in '_*':
+            return None
         # _**T**_ o **T**
-        m = re.match(r'^\s*_?\s*\*\*(.+?)\*\*\s*_?\s*$', s)
+        m = BOLD_STAR_RE.match(s)
         if m:
             return m.group(1).strip()
         # _ __T__ _ o __T__
-        m = re.match(r'^\s*_?\s*__(.+?)__\s*_?\s*$', s)
+        m = BOLD_UNDERSCORE_RE.match(s)
         if m:
             return m.group(1).strip()
         return None
@@ -97,16 +146,24 @@ class PDFChunker:
           - Si está en MAYÚSCULAS → sección principal (level 1)
           - Si parece numerada (1), 2), III)...) → subsección (level 2)
           - Si parece footer (tel/web/dirección) → se ignora
+
+        Se llama una vez por línea de cada documento: antes de cualquier regex se mira el
+        primer carácter, y la mayoría de las líneas (texto común) se descarta ahí.
         """
+        first = line[:1]
         # Encabezados markdown (# ## ###) siempre se aceptan
-        m = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if m:
-            return True, len(m.group(1)), m.group(2).strip()
+        if first == '#':
+            m = MD_HEADER_RE.match(line)
+            if m:
+                return True, len(m.group(1)), m.group(2).strip()
+            return False, None, None
+        if first not in EMPHASIS_START and not first.isspace():
+            return False, None, None
         title = self._extract_full_emphasis_title(line)
         if title is not None:
             if self._is_footer(title):
                 return False, None, None
-            clean = re.sub(r'</?u>', '', title).strip()
+            clean = UNDERLINE_TAG_RE.sub('', title).strip() if '<' in title else title.strip()
             if self._is_all_caps_heading(clean):
                 return True, 1, clean
             if self._looks_like_numbered_subheading(clean):
@@ -117,9 +174,11 @@ class PDFChunker:
         return False, None, None
 
     def _split_by_sections(self, md_text):
-        """Divide el markdown por encabezados (# y líneas solo en negrita)"""
-        lines = md_text.split('\n')
-        chunks = []
+        """
+        Divide el markdown por encabezados (# y líneas solo en negrita). Acepta el texto
+        completo o un iterable de líneas, y devuelve cada chunk apenas se cierra su sección.
+        """
+        lines = md_text.split('\n') if isinstance(md_text, str) else md_text
         current_chunk = {
             'title': 'Sin sección',
             'level': 0,
@@ -140,15 +199,14 @@ class PDFChunker:
                     if content:  # Solo si hay contenido real
                         # Dividir si es muy grande
                         if len(content) > self.max_chunk_size:
-                            sub_chunks = self._split_large_content(
+                            yield from self._split_large_content(
                                 content,
                                 current_chunk['title'],
                                 current_chunk['hierarchy']
                             )
-                            chunks.extend(sub_chunks)
                         else:
                             current_chunk['content'] = content
-                            chunks.append(current_chunk.copy())
+                            yield current_chunk
                 
                 # Actualizar jerarquía: truncar a nivel-1 y anexar título actual
                 # level es 1-based (1=sección principal, 2=subsección, etc.)
@@ -169,22 +227,18 @@ class PDFChunker:
             content = '\n'.join(current_chunk['content']).strip()
             if content:
                 if len(content) > self.max_chunk_size:
-                    sub_chunks = self._split_large_content(
+                    yield from self._split_large_content(
                         content,
                         current_chunk['title'],
                         current_chunk['hierarchy']
                     )
-                    chunks.extend(sub_chunks)
                 else:
                     current_chunk['content'] = content
-                    chunks.append(current_chunk)
-        
-        return chunks
+                    yield current_chunk
     
     def _split_large_content(self, content, title, hierarchy):
-        """Divide contenido grande manteniendo el contexto"""
-        chunks = []
-        
+        """Divide contenido grande manteniendo el contexto (genera las partes en orden)"""
+
         # Intentar dividir por párrafos
         paragraphs = [p for p in content.split('\n\n') if p.strip()]
         
@@ -197,12 +251,13 @@ class PDFChunker:
             
             if current_size + para_size > self.max_chunk_size and current:
                 # Guardar chunk actual
-                chunks.append({
+                yield {
                     'title': f"{title} (parte {part})",
+                    'section_base': title,
                     'level': len(hierarchy),
                     'content': '\n\n'.join(current),
                     'hierarchy': hierarchy + [f"parte {part}"]
-                })
+                }
                 
                 # Overlap: mantener último párrafo
                 if self.overlap > 0 and current:
@@ -219,28 +274,37 @@ class PDFChunker:
         
         # Último chunk
         if current:
-            chunks.append({
+            yield {
                 'title': f"{title} (parte {part})" if part > 1 else title,
+                'section_base': title,
                 'level': len(hierarchy),
                 'content': '\n\n'.join(current),
                 'hierarchy': hierarchy + ([f"parte {part}"] if part > 1 else [])
-            })
-        
-        return chunks
+            }
     
     def _prepare_for_qdrant(self, chunks, pdf_path, custom_metadata=None):
         """Prepara chunks para insertar en Qdrant con formato compatible con n8n"""
-        documents = []
+        documents = list(self._iter_prepared(chunks, pdf_path, custom_metadata))
+        for doc in documents:
+            doc['metadata']['total_chunks'] = len(documents)
+        return documents
+
+    def _iter_prepared(self, chunks, pdf_path, custom_metadata=None):
+        """Convierte cada chunk al formato de Qdrant a medida que llega (sin 'total_chunks')"""
         filename = Path(pdf_path).name
+        document_id = (custom_metadata or {}).get('document_id')
+        namespace = document_id if document_id is not None else filename
+        occurrences = {}
         
         for i, chunk in enumerate(chunks):
-            # Crear ID único
-            chunk_id = hashlib.md5(
-                f"{filename}_{i}_{chunk['title']}".encode()
-            ).hexdigest()
+            # ID estable por contenido (ver stable_chunk_id)
+            hierarchy = ' > '.join(chunk['hierarchy'])
+            content_hash = chunk_content_hash(hierarchy, chunk['content'])
+            occurrence = occurrences[content_hash] = occurrences.get(content_hash, -1) + 1
+            chunk_id = stable_chunk_id(namespace, content_hash, occurrence)
             
             #   pageContent en nivel superior, metadata anidado
-            doc = {
+            yield {
                 'id': chunk_id,
                 'text': chunk['content'], 
                 'pageContent': chunk['content'],  
@@ -248,21 +312,18 @@ class PDFChunker:
                     
                     'filename': filename,
                     'section_title': chunk['title'],
+                    'section_base': chunk.get('section_base') or section_base(chunk['title']),
                     'section_level': chunk['level'],
-                    'section_hierarchy': ' > '.join(chunk['hierarchy']),
+                    'section_hierarchy': hierarchy,
                     'full_path': chunk['hierarchy'],
                     'chunk_index': i,
-                    'total_chunks': len(chunks),
                     'has_identified_section': True,
                     'ingesta': datetime.now().isoformat(),
                     'chunk_length': len(chunk['content']),
+                    'content_hash': content_hash,
                     **(custom_metadata or {})
                 }
             }
-            
-            documents.append(doc)
-        
-        return documents
 
 
 # Función principal para usar desde Flask
@@ -270,4 +331,10 @@ def process_pdf_file(pdf_path, metadata=None):
     """Función principal para procesar un PDF"""
     chunker = PDFChunker(max_chunk_size=1500, overlap=200)
     documents = chunker.process_pdf(pdf_path, metadata)
-    return documents
\ No newline at end of file
+    return documents
+
+
+def iter_pdf_documents(pdf_path, metadata=None):
+    """Como process_pdf_file pero en streaming: chunks listos para Qdrant a medida que se generan"""
+    chunker = PDFChunker(max_chunk_size=1500, overlap=200)
+    return chunker.iter_documents(pdf_path, metadata)
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+
+import pymupdf
+import pymupdf4llm
+
+
+def _convert_pages(pdf_path: str, pages: List[int], hdr_info) -> str:
+    return pymupdf4llm.to_markdown(pdf_path, pages=pages, hdr_info=hdr_info)
+
+
+def page_ranges(page_count: int, parts: int, min_pages: int = 1) -> List[List[int]]:
+    """Parte [0, page_count) en a lo sumo `parts` rangos contiguos de al menos `min_pages` páginas"""
+    parts = max(1, min(parts, page_count // max(min_pages, 1)))
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def conversion_workers() -> int:
+    return int(os.getenv("PDF_CONVERT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def get_conversion_pool() -> ProcessPoolExecutor | None:
+    """Pool compartido de conversión PDF -> Markdown, o None si PDF_CONVERT_WORKERS <= 1"""
+    global _pool
+    workers = conversion_workers()
+    if workers <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def iter_pdf_markdown(pdf_path: str, workers: int = None, pool: ProcessPoolExecutor = None,
+                      min_pages_per_task: int = None) -> Iterator[str]:
+    """
+    Convierte un PDF a Markdown por rangos de páginas y los devuelve en orden a medida
+    que están listos, para empezar a dividir en chunks sin esperar el documento entero.
+    Los rangos se reparten entre procesos (PDF_CONVERT_WORKERS; con 1 se convierten de
+    a uno en el proceso actual).
+
+    Los niveles de encabezado salen de los tamaños de fuente de todo el documento: se
+    calculan una vez acá (IdentifyHeaders) y se pasan a cada rango, así un título se
+    clasifica igual sin importar en qué rango cae. pymupdf4llm concatena las páginas sin
+    separador, por lo que unir los rangos en orden da el mismo texto que una sola llamada.
+    """
+    workers = workers or conversion_workers()
+    pool = pool or (get_conversion_pool() if workers > 1 else None)
+    min_pages = min_pages_per_task or int(os.getenv("PDF_CONVERT_MIN_PAGES", "4"))
+
+    with pymupdf.open(pdf_path) as doc:
+        if pool is None:
+            # En proceso: rangos de min_pages páginas, cada uno disponible apenas se convierte
+            ranges = page_ranges(doc.page_count, -(-doc.page_count // min_pages), min_pages)
+        else:
+            # Dos rangos por worker para repartir mejor páginas de costo desparejo
+            ranges = page_ranges(doc.page_count, workers * 2, min_pages)
+        if len(ranges) <= 1:
+            yield pymupdf4llm.to_markdown(doc)
+            return
+        hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+
+        if pool is None:
+            for pages in ranges:
+                yield pymupdf4llm.to_markdown(doc, pages=pages, hdr_info=hdr_info)
+            return
+
+    futures = [pool.submit(_convert_pages, pdf_path, pages, hdr_info) for pages in ranges]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def pdf_to_markdown(pdf_path: str, workers: int = None, pool: ProcessPoolExecutor = None,
+                    min_pages_per_task: int = None) -> str:
+    """Markdown completo de un PDF (ver iter_pdf_markdown)"""
+    return "".join(iter_pdf_markdown(pdf_path, workers, pool, min_pages_per_task))
@@ -1,99 +1,451 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, Distance, VectorParams, Filter, FieldCondition, MatchValue
-from typing import List, Dict, Any
+from qdrant_client.models import (
+    Distance, VectorParams, Filter, FieldCondition, MatchValue,
+    PayloadSchemaType, IntegerIndexParams, KeywordIndexParams,
+    HnswConfigDiff, SearchParams, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    OrderBy, Direction, Range, Prefetch, FusionQuery, Fusion, RrfQuery, Rrf,
+    PointIdsList, SetPayload, SetPayloadOperation, HasIdCondition
+)
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Iterable, Tuple
+import numpy as np
 import os
+import threading
+import time
+
+from src.utils.metrics import LatencyStats
+from src.utils.sparse import SPARSE_VECTOR_NAME, BM25SparseEncoder, sparse_vectors_config
+
+CHUNK_INDEX_KEY = 'metadata.chunk_index'
+# Vector denso de la jerarquía de la sección (el del contenido sigue siendo el sin nombre)
+TITLE_VECTOR_NAME = 'title'
+SECTION_BASE_KEY = 'metadata.section_base'
+
+# Índices de payload para los campos por los que filtramos y ordenamos
+PAYLOAD_INDEXES = {
+    'metadata.document_id': IntegerIndexParams(type=PayloadSchemaType.INTEGER, lookup=True, range=False),
+    'metadata.chunk_index': IntegerIndexParams(type=PayloadSchemaType.INTEGER, lookup=True, range=True),
+    'metadata.section_title': KeywordIndexParams(type=PayloadSchemaType.KEYWORD),
+    'metadata.section_base': KeywordIndexParams(type=PayloadSchemaType.KEYWORD),
+    'metadata.filename': KeywordIndexParams(type=PayloadSchemaType.KEYWORD),
+}
+
+
+class TimedQdrantClient:
+    """Proxy de QdrantClient que registra la latencia de cada llamada por método"""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def timed(*args, **kwargs):
+            stats = self.latency.get(name)
+            if stats is None:
+                with self._lock:
+                    stats = self.latency.setdefault(name, LatencyStats())
+            with stats.time():
+                return attr(*args, **kwargs)
+
+        return timed
+
+    def stats(self) -> dict:
+        return {name: stats.summary() for name, stats in sorted(self.latency.items())}
+
+
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+
+def collection_settings(quantization: str = "none", on_disk: bool = False, m: int = 16,
+                        ef_construct: int = 100, always_ram: bool = True,
+                        title_vector: bool = True) -> Dict[str, Any]:
+    """
+    Parámetros de create_collection para la colección de chunks.
+
+    - quantization: none | scalar (int8) | binary. Los vectores cuantizados quedan en RAM
+      (always_ram) y los originales se usan para el rescoring.
+    - on_disk: guarda los vectores originales en disco (memmap) en lugar de RAM.
+    - m / ef_construct: parámetros de construcción del grafo HNSW.
+    - title_vector: agrega el vector nombrado "title" (embedding de section_hierarchy).
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Cuantización inválida '{quantization}', opciones: {', '.join(QUANTIZATION_MODES)}")
+
+    quantization_config = None
+    if quantization == "scalar":
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    elif quantization == "binary":
+        quantization_config = BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=always_ram)
+        )
+
+    content = VectorParams(
+        size=1024,  # multilingual-e5-large tiene dimensión 1024
+        distance=Distance.COSINE,
+        on_disk=on_disk
+    )
+    return {
+        # "" es el vector por defecto: n8n y las consultas sin `using` siguen usando el del contenido
+        'vectors_config': {"": content, TITLE_VECTOR_NAME: content} if title_vector else content,
+        # Vector sparse BM25 para la búsqueda híbrida (el denso sigue sin nombre, como lo usa n8n)
+        'sparse_vectors_config': sparse_vectors_config(),
+        'hnsw_config': HnswConfigDiff(m=m, ef_construct=ef_construct),
+        'quantization_config': quantization_config,
+    }
+
+
+def collection_settings_from_env() -> Dict[str, Any]:
+    """collection_settings según variables QDRANT_* (ver .env.example)"""
+    return collection_settings(
+        quantization=os.getenv("QDRANT_QUANTIZATION", "none").lower(),
+        on_disk=os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true",
+        m=int(os.getenv("QDRANT_HNSW_M", "16")),
+        ef_construct=int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100")),
+        always_ram=os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true",
+        title_vector=os.getenv("QDRANT_TITLE_VECTOR", "true").lower() == "true",
+    )
+
+
+def is_indexable(chunk: Dict[str, Any]) -> bool:
+    """False para chunks vacíos o demasiado cortos, que no se insertan"""
+    content = chunk.get('pageContent', chunk.get('text', ''))
+    return bool(content) and len(content.strip()) >= 10
+
+
+@dataclass
+class InsertResult:
+    """Resultado de una carga masiva en Qdrant"""
+    points_written: int = 0
+    skipped_short: int = 0
+    batch_seconds: List[float] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.points_written > 0
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+
+@dataclass
+class ExpansionResult:
+    """Chunks de contexto agrupados por clave, con las idas y vueltas a Qdrant que costaron"""
+    groups: Dict[Tuple, List[Dict]] = field(default_factory=dict)
+    round_trips: int = 0
+    elapsed_ms: float = 0.0
+
+    def timings(self) -> dict:
+        return {'round_trips': self.round_trips, 'ms': round(self.elapsed_ms, 1)}
+
+    def window_for(self, document_id: int, chunk_index: int) -> Tuple | None:
+        """Clave (document_id, desde, hasta) de la ventana que contiene al chunk"""
+        for key in self.groups:
+            if key[0] == document_id and key[1] <= chunk_index <= key[2]:
+                return key
+        return None
+
+
+def merge_windows(positions: Iterable[Tuple[int, int]], k: int) -> List[Tuple[int, int, int]]:
+    """Ventanas [chunk_index - k, chunk_index + k] por documento, fusionando las que se solapan o tocan"""
+    por_documento = {}
+    for document_id, chunk_index in positions:
+        por_documento.setdefault(document_id, []).append(chunk_index)
+
+    windows = []
+    for document_id, indices in por_documento.items():
+        start = end = None
+        for index in sorted(set(indices)):
+            lo, hi = max(index - k, 0), index + k
+            if end is not None and lo <= end + 1:
+                end = max(end, hi)
+                continue
+            if end is not None:
+                windows.append((document_id, start, end))
+            start, end = lo, hi
+        windows.append((document_id, start, end))
+    return windows
+
+
+_client = None
+_client_lock = threading.Lock()
+_service = None
+_service_lock = threading.Lock()
+_bootstrap_lock = threading.Lock()
+_bootstrapped = set()
+
+
+def get_qdrant_client() -> TimedQdrantClient:
+    """
+    Cliente Qdrant compartido por todo el proceso (reutiliza conexiones).
+    Con QDRANT_PREFER_GRPC=true usa gRPC (puerto QDRANT_GRPC_PORT, 6334 por defecto).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TimedQdrantClient(QdrantClient(
+                    url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+                    prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true",
+                    grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+                    timeout=int(os.getenv("QDRANT_TIMEOUT", "30")),
+                ))
+    return _client
+
+
+def get_qdrant_service() -> "QdrantService":
+    """
+    Instancia compartida de QdrantService (reintenta el bootstrap si Qdrant no estaba disponible).
+    Con VECTOR_STORE=local usa LocalVectorStore (NumPy en proceso, sin servidor).
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                if os.getenv("VECTOR_STORE", "qdrant").lower() == "local":
+                    from src.utils.local_vector_store import LocalVectorStore
+                    _service = LocalVectorStore.from_env()
+                else:
+                    _service = QdrantService()
+                return _service
+    _service.ensure_bootstrapped()
+    return _service
+
+
+def bootstrap_qdrant() -> bool:
+    """Verifica/crea la colección al iniciar la app (una sola vez por proceso)"""
+    return get_qdrant_service().is_bootstrapped
+
 
 class QdrantService:
     """Servicio para interactuar con Qdrant"""
     
-    def __init__(self):
+    def __init__(self, client=None, collection_name: str = None):
         self.url = os.getenv("QDRANT_URL", "http://localhost:6333")
-        self.client = QdrantClient(url=self.url)
-        self.collection_name = "docs"
+        self.client = client or get_qdrant_client()
+        # Por defecto el alias (QDRANT_COLLECTION) que apunta a la versión vigente "docs_vN"
+        self.collection_name = collection_name or os.getenv("QDRANT_COLLECTION", "docs")
+        self.sparse_encoder = BM25SparseEncoder()
+        self._vector_names = None
+        self._vector_names_at = 0.0
         
-        # Asegurar que la colección existe
-        self._ensure_collection_exists()
+        # Asegurar que la colección existe (solo la primera vez en el proceso)
+        self.ensure_bootstrapped()
+
+    @property
+    def is_bootstrapped(self) -> bool:
+        return (id(self.client), self.collection_name) in _bootstrapped
+
+    def ensure_bootstrapped(self) -> bool:
+        """Ejecuta la verificación de la colección una sola vez; reintenta si antes falló"""
+        if self.is_bootstrapped:
+            return True
+        with _bootstrap_lock:
+            if not self.is_bootstrapped and self._ensure_collection_exists():
+                _bootstrapped.add((id(self.client), self.collection_name))
+        return self.is_bootstrapped
     
-    def _ensure_collection_exists(self):
+    def _ensure_collection_exists(self) -> bool:
         """Crea la colección si no existe"""
+        from src.utils.collection_versions import bootstrap_version, resolve_alias
+
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [col.name for col in collections]
-            
-            if self.collection_name not in collection_names:
+            exists = (self.client.collection_exists(self.collection_name)
+                      or resolve_alias(self.client, self.collection_name) is not None)
+            if not exists:
                 print(f"📦 Creando colección '{self.collection_name}'...")
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=1024,  # multilingual-e5-large tiene dimensión 1024
-                        distance=Distance.COSINE
+                if self.collection_name == os.getenv("QDRANT_COLLECTION", "docs"):
+                    # Instalación nueva: colección versionada detrás del alias (ver scripts/reindex_collection.py)
+                    bootstrap_version(self.client, self.collection_name, collection_settings_from_env())
+                else:
+                    self.client.create_collection(
+                        collection_name=self.collection_name,
+                        **collection_settings_from_env()
                     )
-                )
                 print(f"✅ Colección '{self.collection_name}' creada")
             else:
                 print(f"✅ Colección '{self.collection_name}' ya existe")
+                faltantes = [name for name in (SPARSE_VECTOR_NAME, TITLE_VECTOR_NAME) if name not in self.vector_names]
+                if faltantes:
+                    print(f"⚠️ La colección '{self.collection_name}' no tiene los vectores {', '.join(faltantes)}: "
+                          f"búsqueda híbrida / por título deshabilitadas hasta reindexar")
+
+            # También migra colecciones existentes que todavía no tienen los índices
+            self.ensure_payload_indexes()
+            return True
                 
         except Exception as e:
             print(f"⚠️ Error verificando colección: {e}")
+            return False
+
+    @property
+    def vector_names(self) -> set:
+        """
+        Vectores nombrados (densos y sparse) de la colección; las creadas antes no los tienen.
+        Se vuelve a consultar cada minuto: el alias puede pasar a otra versión de la colección.
+        """
+        if self._vector_names is None or time.monotonic() - self._vector_names_at > 60:
+            try:
+                params = self.client.get_collection(self.collection_name).config.params
+            except Exception:
+                return self._vector_names or set()
+            dense = params.vectors if isinstance(params.vectors, dict) else {}
+            self._vector_names = {name for name in dense if name} | set(params.sparse_vectors or {})
+            self._vector_names_at = time.monotonic()
+        return self._vector_names
+
+    @property
+    def has_sparse_vectors(self) -> bool:
+        return SPARSE_VECTOR_NAME in self.vector_names
+
+    @property
+    def has_title_vector(self) -> bool:
+        return TITLE_VECTOR_NAME in self.vector_names
+
+    def ensure_payload_indexes(self) -> List[str]:
+        """Crea los índices de payload faltantes y devuelve los campos indexados ahora"""
+        existing = self.client.get_collection(self.collection_name).payload_schema or {}
+        created = []
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name in existing:
+                continue
+            print(f"🗂️ Creando índice de payload '{field_name}'...")
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=schema,
+                wait=True
+            )
+            created.append(field_name)
+        return created
+
+    def stats(self) -> dict:
+        """Latencia de las llamadas a Qdrant por operación"""
+        return self.client.stats() if isinstance(self.client, TimedQdrantClient) else {}
     
-    def insert_chunks(self, chunks: List[Dict[str, Any]], embeddings: List[List[float]], batch_size: int = 100) -> bool:
+    def insert_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray | List[List[float]],
+                      batch_size: int = 100, parallel: int = None,
+                      title_embeddings: np.ndarray = None) -> InsertResult:
         """
-        Inserta chunks con sus embeddings en Qdrant
+        Inserta chunks con sus embeddings en Qdrant (y los de su jerarquía en el vector "title")
+
+        Los embeddings se mantienen como matriz float32 contigua y se envían por batches
+        concurrentes (QDRANT_UPLOAD_PARALLEL) sin esperar a que cada uno se indexe; solo el
+        último batch, enviado cuando el resto ya fue aceptado, espera la confirmación de que
+        todo quedó aplicado.
         """
+        result = InsertResult()
+        start = time.perf_counter()
         try:
             if len(chunks) != len(embeddings):
                 raise ValueError(f"Número de chunks ({len(chunks)}) no coincide con embeddings ({len(embeddings)})")
         
-            # Preparar puntos
-            points = []
-            for chunk, embedding in zip(chunks, embeddings):
+            # Preparar ids y payloads (los vectores quedan en la matriz)
+            valid_rows = []
+            ids = []
+            payloads = []
+            for row, chunk in enumerate(chunks):
                 
-                content = chunk.get('pageContent', chunk.get('text', ''))
-            
-                payload = {
-                    'pageContent': content,  # Para n8n/LangChain
-                    'metadata': chunk['metadata']
-                }
-            
                 # Validación
-                if not content or len(content.strip()) < 10:
-                    print(f"⚠️ Advertencia: chunk {chunk['id']} tiene contenido vacío o muy corto")
+                if not is_indexable(chunk):
+                    result.skipped_short += 1
                     continue  # Saltar chunks vacíos
             
-                points.append(
-                    PointStruct(
-                        id=chunk['id'],
-                        vector=embedding,
-                        payload=payload
-                    )
-                )
-        
-            if not points:
-                print("❌ No hay puntos válidos para insertar")
-                return False
+                valid_rows.append(row)
+                ids.append(chunk['id'])
+                payloads.append({
+                    'pageContent': chunk.get('pageContent', chunk.get('text', '')),  # Para n8n/LangChain
+                    'metadata': chunk['metadata']
+                })
+
+            if result.skipped_short:
+                print(f"⚠️ Advertencia: {result.skipped_short} chunks con contenido vacío o muy corto fueron salteados")
         
-            # Insertar en batches
-            total_inserted = 0
-            for i in range(0, len(points), batch_size):
-                batch = points[i:i + batch_size]
-            
-                self.client.upsert(
+            if not ids:
+                result.error = "No hay puntos válidos para insertar"
+                print(f"❌ {result.error}")
+                return result
+
+            vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32)[valid_rows])
+            titles = None
+            if title_embeddings is not None and self.has_title_vector:
+                titles = np.asarray(title_embeddings, dtype=np.float32)[valid_rows]
+            batches = [(i, min(i + batch_size, len(ids))) for i in range(0, len(ids), batch_size)]
+            parallel = parallel or int(os.getenv("QDRANT_UPLOAD_PARALLEL", "4"))
+
+            sparse = None
+            if self.has_sparse_vectors:
+                # Texto léxico: jerarquía de la sección + contenido (matchea también por encabezados)
+                sparse = self.sparse_encoder.encode_documents([
+                    f"{payload['metadata'].get('section_hierarchy', '')}\n{payload['pageContent']}"
+                    for payload in payloads
+                ])
+
+            def batch_vectors(lo, hi):
+                # Sin sparse los densos viajan como matrices (por nombre si está "title");
+                # solo el vector sparse obliga a armar un dict por punto
+                if sparse is None:
+                    if titles is None:
+                        return vectors[lo:hi]
+                    return {"": vectors[lo:hi], TITLE_VECTOR_NAME: titles[lo:hi]}
+                rows = []
+                for i in range(lo, hi):
+                    row = {"": vectors[i].tolist()}
+                    if sparse is not None:
+                        row[SPARSE_VECTOR_NAME] = sparse[i]
+                    if titles is not None:
+                        row[TITLE_VECTOR_NAME] = titles[i].tolist()
+                    rows.append(row)
+                return rows
+
+            def upload(bounds, wait=False):
+                batch_start = time.perf_counter()
+                lo, hi = bounds
+                self.client.upload_collection(
                     collection_name=self.collection_name,
-                    points=batch
+                    vectors=batch_vectors(lo, hi),
+                    payload=payloads[lo:hi],
+                    ids=ids[lo:hi],
+                    batch_size=hi - lo,
+                    wait=wait
                 )
-            
-                total_inserted += len(batch)
-                print(f"✅ Insertados {total_inserted}/{len(points)} puntos")
-        
-            print(f"🎉 Todos los {len(points)} puntos insertados exitosamente")
-            return True
+                return time.perf_counter() - batch_start
+
+            # Todos menos el último en paralelo, sin esperar la indexación
+            if len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=min(parallel, len(batches) - 1)) as executor:
+                    result.batch_seconds.extend(executor.map(upload, batches[:-1]))
+            # Qdrant aplica las actualizaciones en orden: esperar el último implica esperar todos
+            result.batch_seconds.append(upload(batches[-1], wait=True))
+
+            result.points_written = len(ids)
+            result.elapsed_seconds = time.perf_counter() - start
+            print(f"🎉 {result.points_written} puntos insertados en {len(batches)} batches ({result.elapsed_seconds:.2f}s)")
+            return result
         
         except Exception as e:
+            result.error = str(e)
+            result.elapsed_seconds = time.perf_counter() - start
             print(f"❌ Error insertando en Qdrant: {e}")
             import traceback
             traceback.print_exc()
-            return False
+            return result
     
+    def flush(self):
+        """Qdrant persiste cada escritura; existe por la interfaz compartida con LocalVectorStore"""
+
     def delete_by_document_id(self, document_id: int) -> bool:
         """Elimina todos los chunks de un documento"""
         try:
@@ -120,75 +472,285 @@ class QdrantService:
             traceback.print_exc()
             return False
     
-    def get_chunks_by_document(self, document_id: int, limit: int = 100) -> List[Dict]:
-        """Obtiene todos los chunks de un documento"""
-        try:
-            results = self.client.scroll(
+    def get_chunk_metadata(self, document_id: int) -> Dict[str, Dict]:
+        """Metadata de cada chunk del documento por id, sin el contenido (para comparar versiones)"""
+        return {
+            str(point.id): point.payload.get('metadata', {})
+            for point in self._iter_scroll(self._document_filter(document_id), 256, with_payload=['metadata'])
+        }
+
+    def update_metadata(self, updates: Dict[str, Dict], batch_size: int = 256):
+        """Actualiza campos de la metadata de varios puntos (id -> campos) sin tocar sus vectores"""
+        operations = [
+            SetPayloadOperation(set_payload=SetPayload(payload=fields, points=[point_id], key='metadata'))
+            for point_id, fields in updates.items()
+        ]
+        for i in range(0, len(operations), batch_size):
+            self.client.batch_update_points(
                 collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="metadata.document_id",  
-                            match=MatchValue(value=document_id)
-                        )
-                    ]
+                update_operations=operations[i:i + batch_size],
+                wait=True
+            )
+
+    def delete_points(self, ids: List[str]):
+        """Elimina puntos por id"""
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=list(ids)),
+            wait=True
+        )
+
+    def set_total_chunks(self, document_id: int, total: int):
+        """Completa 'total_chunks' en la metadata de todos los chunks de un documento (ingesta en streaming)"""
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload={'total_chunks': total},
+            points=self._document_filter(document_id),
+            key='metadata',
+            wait=True
+        )
+
+    @staticmethod
+    def _document_filter(document_id: int, *conditions) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(
+                    key="metadata.document_id",
+                    match=MatchValue(value=document_id)
                 ),
-                limit=limit,
-                with_payload=True,
+                *conditions
+            ]
+        )
+
+    @staticmethod
+    def _to_chunk(point, score: float = None) -> Dict:
+        """Mantener estructura con pageContent y metadata aplanada"""
+        chunk = {
+            'id': point.id,
+            'payload': {
+                'pageContent': point.payload.get('pageContent', ''),
+                **point.payload.get('metadata', {})
+            }
+        }
+        if score is not None:
+            chunk['score'] = score
+        return chunk
+
+    def _scroll_pages(self, scroll_filter: Filter = None, page_size: int = 100,
+                      with_payload: bool | List[str] = True) -> Iterator:
+        """Páginas (puntos, offset) del filtro siguiendo next_page_offset"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=with_payload,
                 with_vectors=False
             )
-            
-            chunks = []
-            for point in results[0]:
-                # Mantener estructura con pageContent y metadata
-                chunks.append({
-                    'id': point.id,
-                    'payload': {
-                        'pageContent': point.payload.get('pageContent', ''),
-                        **point.payload.get('metadata', {})
-                    }
-                })
-            
-            return chunks
+            yield points, offset
+            if offset is None:
+                return
+
+    def _iter_scroll(self, scroll_filter: Filter = None, page_size: int = 100,
+                     with_payload: bool | List[str] = True) -> Iterator:
+        """Recorre todos los puntos del filtro siguiendo next_page_offset"""
+        for points, _ in self._scroll_pages(scroll_filter, page_size, with_payload):
+            yield from points
+
+    def _scroll_ordered_page(self, scroll_filter: Filter, start_from: int | None, limit: int,
+                             direction: Direction = Direction.ASC) -> List:
+        """Una página de scroll ordenado por chunk_index (usa el índice de rango)"""
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=scroll_filter,
+            order_by=OrderBy(key=CHUNK_INDEX_KEY, direction=direction, start_from=start_from),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False
+        )
+        return points
+
+    def _iter_ordered(self, scroll_filter: Filter, page_size: int = 100,
+                      expansion: ExpansionResult = None) -> Iterator:
+        """
+        Recorre los puntos del filtro en orden de chunk_index, página por página.
+        Con expansion, cada scroll suma en expansion.round_trips.
+
+        chunk_index no siempre es único (update_pdf inserta antes de borrar): cada página
+        siguiente arranca en el último chunk_index, no en el siguiente, y se descartan los
+        puntos de ese valor que ya salieron en la página anterior.
+        """
+        def page(start_from, limit):
+            if expansion is not None:
+                expansion.round_trips += 1
+            return self._scroll_ordered_page(scroll_filter, start_from, limit)
+
+        try:
+            points = page(None, page_size)
+        except Exception as e:
+            # Colecciones sin índice de rango en chunk_index: ordenar en memoria
+            print(f"⚠️ Scroll ordenado no disponible ({e}), ordenando en memoria")
+            unordered = []
+            for points, _ in self._scroll_pages(scroll_filter, page_size):
+                if expansion is not None:
+                    expansion.round_trips += 1
+                unordered.extend(points)
+            yield from sorted(unordered, key=lambda p: p.payload.get('metadata', {}).get('chunk_index', 0))
+            return
+
+        def chunk_index(point):
+            return point.payload.get('metadata', {}).get('chunk_index', 0)
+
+        limit = page_size
+        last_index = None
+        seen = set()  # ids ya devueltos con chunk_index == last_index
+        while points:
+            yield from (point for point in points if point.id not in seen)
+            if len(points) < limit:
+                return
+            boundary = {point.id for point in points if chunk_index(point) == chunk_index(points[-1])}
+            seen = seen | boundary if chunk_index(points[-1]) == last_index else boundary
+            last_index = chunk_index(points[-1])
+            # La página repite los ya vistos: se amplía para que siempre traiga page_size nuevos
+            limit = page_size + len(seen)
+            points = page(last_index, limit)
+
+    def iter_chunks_by_document(self, document_id: int, page_size: int = 100) -> Iterator[Dict]:
+        """Genera los chunks de un documento en orden de chunk_index sin traerlos todos juntos"""
+        for point in self._iter_ordered(self._document_filter(document_id), page_size):
+            yield self._to_chunk(point)
+
+    def get_chunks_by_document(self, document_id: int, limit: int = None) -> List[Dict]:
+        """Obtiene todos los chunks de un documento (o los primeros `limit`) ordenados"""
+        try:
+            return list(islice(self.iter_chunks_by_document(document_id), limit))
             
         except Exception as e:
             print(f"❌ Error obteniendo chunks: {e}")
             return []
+
+    def count_chunks(self, document_id: int) -> int:
+        """Cantidad exacta de chunks de un documento"""
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._document_filter(document_id),
+            exact=True
+        ).count
+
+    def get_last_chunk_index(self, document_id: int) -> int | None:
+        """Mayor chunk_index del documento (None si no tiene chunks)"""
+        points = self._scroll_ordered_page(self._document_filter(document_id), None, 1, direction=Direction.DESC)
+        return points[0].payload.get('metadata', {}).get('chunk_index') if points else None
+
+    def get_chunks_page(self, document_id: int, page: int = 1, per_page: int = 50) -> List[Dict]:
+        """Chunks con chunk_index en [(page-1)*per_page, page*per_page) en orden"""
+        first = (page - 1) * per_page
+        scroll_filter = self._document_filter(
+            document_id,
+            FieldCondition(key=CHUNK_INDEX_KEY, range=Range(gte=first, lt=first + per_page))
+        )
+        return [self._to_chunk(point) for point in self._iter_ordered(scroll_filter, per_page)]
     
-    def search_similar(self, query_vector: List[float], limit: int = 5, document_id: int = None) -> List[Dict]:
+    def search_params(self, hnsw_ef: int = None, exact: bool = None) -> SearchParams:
+        """
+        Parámetros de búsqueda: los argumentos pisan la configuración
+        (QDRANT_SEARCH_HNSW_EF, QDRANT_SEARCH_EXACT, QDRANT_RESCORE, QDRANT_OVERSAMPLING).
+        Los de cuantización se ignoran si la colección no está cuantizada.
+        """
+        if hnsw_ef is None and os.getenv("QDRANT_SEARCH_HNSW_EF"):
+            hnsw_ef = int(os.getenv("QDRANT_SEARCH_HNSW_EF"))
+        if exact is None:
+            exact = os.getenv("QDRANT_SEARCH_EXACT", "false").lower() == "true"
+        return SearchParams(
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            quantization=QuantizationSearchParams(
+                rescore=os.getenv("QDRANT_RESCORE", "true").lower() == "true",
+                oversampling=float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+            )
+        )
+
+    def search_similar(self, query_vector: List[float], limit: int = 5, document_id: int = None,
+                       hnsw_ef: int = None, exact: bool = None, query_text: str = None,
+                       mode: str = None) -> List[Dict]:
+        """
+        Búsqueda por similitud en una consulta a Qdrant, combinando:
+        - el vector del contenido,
+        - el vector "title" (jerarquía de la sección), con peso SEARCH_TITLE_WEIGHT,
+        - en modo hybrid (SEARCH_MODE, por defecto) y con query_text, el sparse BM25.
+        Los rankings se fusionan con RRF ponderado (o DBSF con SEARCH_FUSION=dbsf). Los
+        vectores que la colección no tiene se omiten.
+
+        El orden es el de la fusión, pero 'score' sigue siendo la similitud coseno con el
+        vector del contenido (n8n la muestra como porcentaje); el puntaje de la fusión, que
+        tiene otro rango, va en 'fused_score'.
+        """
         try:
             query_filter = None
             if document_id:
-                query_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="metadata.document_id",
-                            match=MatchValue(value=document_id)
-                        )
-                    ]
-                )
+                query_filter = self._document_filter(document_id)
+
+            mode = mode or os.getenv("SEARCH_MODE", "hybrid")
+            params = self.search_params(hnsw_ef=hnsw_ef, exact=exact)
+            prefetch_limit = int(os.getenv("SEARCH_HYBRID_PREFETCH", "40"))
+            title_weight = float(os.getenv("SEARCH_TITLE_WEIGHT", "0.5"))
+
+            prefetch = [Prefetch(query=query_vector, filter=query_filter, params=params, limit=prefetch_limit)]
+            weights = [1.0]
+            if self.has_title_vector and title_weight > 0:
+                prefetch.append(Prefetch(
+                    query=query_vector,
+                    using=TITLE_VECTOR_NAME,
+                    filter=query_filter,
+                    params=params,
+                    limit=prefetch_limit
+                ))
+                weights.append(title_weight)
+            if mode == "hybrid" and query_text and self.has_sparse_vectors:
+                prefetch.append(Prefetch(
+                    query=self.sparse_encoder.encode_query(query_text),
+                    using=SPARSE_VECTOR_NAME,
+                    filter=query_filter,
+                    limit=prefetch_limit
+                ))
+                weights.append(1.0)
 
-            # Traemos más resultados para poder re-rankear
+            if len(prefetch) == 1:
+                results = self.client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_vector,
+                    query_filter=query_filter,
+                    search_params=params,
+                    limit=20,
+                    with_payload=True,
+                    with_vectors=False,
+                ).points
+                return [self._to_chunk(point, score=point.score) for point in results][:limit]
+
+            if os.getenv("SEARCH_FUSION", "rrf").lower() == "dbsf":
+                fusion = FusionQuery(fusion=Fusion.DBSF)
+            else:
+                fusion = RrfQuery(rrf=Rrf(weights=weights))
             results = self.client.query_points(
                 collection_name=self.collection_name,
-                query=query_vector,
+                prefetch=prefetch,
+                query=fusion,
                 query_filter=query_filter,
                 limit=20,
                 with_payload=True,
                 with_vectors=False,
-            ).points
+            ).points[:limit]
 
-            return [
-                {
-                    'id': point.id,
-                    'score': point.score,
-                    'payload': {
-                        'pageContent': point.payload.get('pageContent', ''),
-                        **point.payload.get('metadata', {})
-                    }
-                }
-                for point in results
-            ][:limit]
+            # Segunda consulta, acotada a esos ids: el coseno de cada resultado
+            cosine = self._dense_scores(query_vector, [point.id for point in results])
+            chunks = []
+            for point in results:
+                chunk = self._to_chunk(point, score=cosine.get(point.id, 0.0))
+                chunk['fused_score'] = point.score
+                chunks.append(chunk)
+            return chunks
 
         except Exception as e:
             print(f"❌ Error buscando en Qdrant: {e}")
@@ -196,6 +758,21 @@ class QdrantService:
             traceback.print_exc()
             return []
     
+    def _dense_scores(self, query_vector: List[float], ids: List) -> Dict[Any, float]:
+        """Similitud coseno exacta de la query con el vector del contenido de esos puntos"""
+        if not ids:
+            return {}
+        points = self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=Filter(must=[HasIdCondition(has_id=ids)]),
+            search_params=SearchParams(exact=True),
+            limit=len(ids),
+            with_payload=False,
+            with_vectors=False,
+        ).points
+        return {point.id: point.score for point in points}
+
     def get_sample_payloads(self, document_id: int = None, limit: int = 5) -> List[Dict]:
         """
         Obtiene una muestra de payloads para debug
@@ -242,41 +819,107 @@ class QdrantService:
             traceback.print_exc()
             return []
 
-    def get_chunks_by_section(self, section_base: str, document_id: int) -> List[Dict]:
-        """Obtiene todos los chunks de una sección (todas sus partes)"""
+    def get_chunks_by_sections(self, sections: Iterable[Tuple[int, str]], page_size: int = 256) -> ExpansionResult:
+        """
+        Resuelve varias secciones multi-parte (document_id, section_base) con un solo
+        scroll filtrado por la disyunción de todas, en lugar de un scroll por sección.
+        """
+        started = time.perf_counter()
+        result = ExpansionResult(groups={key: [] for key in dict.fromkeys(sections)})
+        if not result.groups:
+            return result
+
+        scroll_filter = Filter(should=[
+            self._document_filter(
+                document_id,
+                FieldCondition(key=SECTION_BASE_KEY, match=MatchValue(value=base))
+            )
+            for document_id, base in result.groups
+        ])
         try:
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="metadata.document_id",
-                            match=MatchValue(value=document_id)
-                        )
-                    ]
-                ),
-                limit=200,
-                with_payload=True,
-                with_vectors=False
+            for points, _ in self._scroll_pages(scroll_filter, page_size):
+                result.round_trips += 1
+                for point in points:
+                    metadata = point.payload.get('metadata', {})
+                    key = (metadata.get('document_id'), metadata.get('section_base'))
+                    if key in result.groups:
+                        result.groups[key].append(self._to_chunk(point, score=1.0))
+
+            for key, chunks in result.groups.items():
+                if chunks:
+                    chunks.sort(key=lambda c: c['payload'].get('chunk_index', 0))
+                else:
+                    # Sin section_base (documento sin backfill): búsqueda individual, con sus scrolls
+                    result.groups[key] = self.get_chunks_by_section(key[1], key[0], expansion=result)
+
+        except Exception as e:
+            print(f"❌ Error buscando hermanos: {e}")
+
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def get_chunk_windows(self, positions: Iterable[Tuple[int, int]], k: int = 1,
+                          page_size: int = 256) -> ExpansionResult:
+        """
+        Chunks vecinos (±k posiciones de chunk_index) de cada (document_id, chunk_index),
+        con las ventanas solapadas fusionadas y un solo scroll por rango de chunk_index.
+        """
+        started = time.perf_counter()
+        windows = merge_windows(positions, k)
+        result = ExpansionResult(groups={window: [] for window in windows})
+        if not windows:
+            return result
+
+        scroll_filter = Filter(should=[
+            self._document_filter(
+                document_id,
+                FieldCondition(key=CHUNK_INDEX_KEY, range=Range(gte=start, lte=end))
             )
+            for document_id, start, end in windows
+        ])
+        try:
+            for points, _ in self._scroll_pages(scroll_filter, page_size):
+                result.round_trips += 1
+                for point in points:
+                    metadata = point.payload.get('metadata', {})
+                    window = result.window_for(metadata.get('document_id'), metadata.get('chunk_index', -1))
+                    if window is not None:
+                        result.groups[window].append(self._to_chunk(point))
+            for chunks in result.groups.values():
+                chunks.sort(key=lambda c: c['payload'].get('chunk_index', 0))
 
-            hermanos = []
-            for point in results[0]:
+        except Exception as e:
+            print(f"❌ Error buscando chunks vecinos: {e}")
+
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def get_chunks_by_section(self, section_base: str, document_id: int,
+                              expansion: ExpansionResult = None) -> List[Dict]:
+        """
+        Obtiene todos los chunks de una sección (todas sus partes) con un scroll filtrado.
+        Con expansion, los scrolls hechos se suman en expansion.round_trips.
+        """
+        try:
+            section_filter = self._document_filter(
+                document_id,
+                FieldCondition(key=SECTION_BASE_KEY, match=MatchValue(value=section_base))
+            )
+            hermanos = [
+                self._to_chunk(point, score=1.0)
+                for point in self._iter_ordered(section_filter, expansion=expansion)
+            ]
+            if hermanos:
+                return hermanos
+
+            # Documentos ingeridos antes de section_base (ver scripts/backfill_section_base.py)
+            for point in self._iter_ordered(self._document_filter(document_id), expansion=expansion):
                 title = point.payload.get('metadata', {}).get('section_title', '')
                 # Matchea "PROGRAMA ANALÍTICO (parte 1)", "(parte 2)", etc.
                 if title.startswith(section_base):
-                    hermanos.append({
-                        'id': point.id,
-                        'score': 1.0,
-                        'payload': {
-                            'pageContent': point.payload.get('pageContent', ''),
-                            **point.payload.get('metadata', {})
-                        }
-                    })
-            # Ordenar por chunk_index para que salgan en orden
-            hermanos.sort(key=lambda x: x['payload'].get('chunk_index', 0))
+                    hermanos.append(self._to_chunk(point, score=1.0))
             return hermanos
 
         except Exception as e:
             print(f"❌ Error buscando hermanos: {e}")
-            return []
\ No newline at end of file
+            return []
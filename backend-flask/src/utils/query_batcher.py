@@ -0,0 +1,98 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from src.utils.metrics import Histogram, LatencyStats
+
+
+class QueryMicroBatcher:
+    """
+    Agrupa las consultas que llegan dentro de una ventana corta (unos ms) en una sola
+    llamada al modelo y devuelve a cada request su vector.
+
+    Evita que búsquedas concurrentes hagan muchos forward pass de a 1 texto compitiendo
+    por los mismos cores.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str], str], np.ndarray],
+                 window_ms: float = 5, max_batch_size: int = 32):
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self.batch_sizes = Histogram(max_bucket=max_batch_size)
+        self.wait_ms = LatencyStats()
+        self.encode_ms = LatencyStats()
+
+    def submit(self, text: str, prefix: str = "") -> np.ndarray:
+        """Encola el texto y bloquea hasta que su batch se procese"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, prefix, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name="query-micro-batcher",
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _collect_batch(self) -> list:
+        """Espera el primer item y junta los que lleguen dentro de la ventana"""
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[3] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            self.batch_sizes.record(len(batch))
+            for _, _, _, enqueued in batch:
+                self.wait_ms.record((started - enqueued) * 1000)
+
+            # Un batch puede mezclar prefijos: se agrupa por prefijo y se hace una llamada por grupo
+            by_prefix = {}
+            for item in batch:
+                by_prefix.setdefault(item[1], []).append(item)
+
+            with self.encode_ms.time():
+                for prefix, items in by_prefix.items():
+                    try:
+                        vectors = self.embed_fn([item[0] for item in items], prefix)
+                        for item, vector in zip(items, vectors):
+                            item[2].set_result(vector)
+                    except Exception as e:
+                        for item in items:
+                            item[2].set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            'window_ms': self.window * 1000,
+            'queue_depth': self._queue.qsize(),
+            'batch_size_histogram': self.batch_sizes.summary(),
+            'added_wait': self.wait_ms.summary(),
+            'encode': self.encode_ms.summary(),
+        }
@@ -0,0 +1,214 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+from src.utils.collection_versions import (
+    create_version, drop_old_versions, is_legacy_collection, resolve_alias, swap_alias
+)
+from src.utils.ingestion import document_metadata, index_pdf
+from src.utils.qdrant_service import QdrantService, collection_settings_from_env, get_qdrant_client
+
+
+def status_file() -> str:
+    return os.getenv("REINDEX_STATUS_FILE", os.path.join(os.getcwd(), 'data', 'reindex_status.json'))
+
+
+def lock_file() -> str:
+    return os.getenv("REINDEX_LOCK_FILE", os.path.join(os.getcwd(), 'data', 'reindex.lock'))
+
+
+@contextmanager
+def document_writes(exclusive: bool = False):
+    """
+    Lock entre procesos sobre las escrituras de documentos. Las rutas que suben, actualizan
+    o borran un documento lo toman compartido (no se bloquean entre sí) hasta el commit; la
+    reindexación lo toma exclusivo para la última puesta al día y el cambio de alias, así
+    ninguna escritura queda entre el último diff y el swap. No-op si no hay fcntl.
+    """
+    if fcntl is None:
+        yield
+        return
+    path = lock_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_status() -> dict | None:
+    """Último estado de reindexación guardado (None si nunca se corrió)"""
+    try:
+        with open(status_file(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class ReindexProgress:
+    """Avance de una reindexación; se guarda en REINDEX_STATUS_FILE después de cada documento"""
+    alias: str
+    target: str
+    previous: str | None = None
+    status: str = "running"
+    total_documents: int = 0
+    documents_done: int = 0
+    documents_failed: List[int] = field(default_factory=list)
+    chunks_written: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    error: str | None = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def throughput(self) -> dict:
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        pending = self.total_documents - self.documents_done - len(self.documents_failed)
+        docs_per_second = self.documents_done / elapsed
+        return {
+            'documents_per_minute': round(docs_per_second * 60, 2),
+            'chunks_per_second': round(self.chunks_written / elapsed, 1),
+            'eta_seconds': round(pending / docs_per_second) if docs_per_second else None,
+        }
+
+    def save(self):
+        path = status_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                **asdict(self),
+                'elapsed_seconds': round(self.elapsed_seconds, 1),
+                'throughput': self.throughput()
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+def reindex_documents(load_documents: Callable[[], List], alias: str = None, client=None,
+                      keep_versions: int = 2, drop_legacy: bool = False,
+                      force: bool = False) -> ReindexProgress:
+    """
+    Reconstruye la colección completa en una versión nueva "<alias>_vN" a partir de los
+    archivos guardados y, al terminar, mueve el alias de forma atómica. Mientras tanto la
+    app y n8n siguen buscando en la versión anterior.
+
+    load_documents devuelve los Document a indexar (leídos de nuevo en cada llamada); se
+    vuelve a llamar al final para incorporar los subidos, reemplazar los actualizados (su
+    file_path cambia) y descartar los borrados durante la reindexación. La última de esas
+    pasadas y el cambio de alias se hacen con document_writes(exclusive=True).
+    Si algún documento falla no se cambia el alias, salvo con force=True.
+    """
+    client = client or get_qdrant_client()
+    alias = alias or os.getenv("QDRANT_COLLECTION", "docs")
+
+    if is_legacy_collection(client, alias) and not drop_legacy:
+        # Se valida antes de construir nada: el cambio de alias fallaría recién al final
+        raise RuntimeError(f"'{alias}' es una colección física, no un alias: reindexar con drop_legacy")
+
+    target = create_version(client, alias, collection_settings_from_env())
+    service = QdrantService(client=client, collection_name=target)
+    progress = ReindexProgress(alias=alias, target=target, previous=resolve_alias(client, alias) or alias)
+    print(f"📦 Reindexando '{alias}' en '{target}' (vigente: '{progress.previous}')")
+
+    indexed: Dict[int, str] = {}  # document_id -> file_path indexado
+    skipped = set()  # sin PDF: no cuentan en total_documents
+
+    def index_all(documents):
+        for doc in documents:
+            if doc.id in indexed:
+                continue
+            indexed[doc.id] = doc.file_path
+            if not doc.file_path or not doc.file_path.lower().endswith('.pdf') or not os.path.exists(doc.file_path):
+                skipped.add(doc.id)
+                progress.total_documents -= 1
+                continue
+            try:
+                result = index_pdf(doc.file_path, document_metadata(doc, os.path.basename(doc.file_path)), service)
+                if not result.ok:
+                    raise RuntimeError(result.error)
+                progress.documents_done += 1
+                progress.chunks_written += result.points_written
+            except Exception as e:
+                print(f"❌ Documento {doc.id} falló: {e}")
+                progress.documents_failed.append(doc.id)
+            progress.save()
+            rate = progress.throughput()
+            print(f"📈 {progress.documents_done + len(progress.documents_failed)}/{progress.total_documents} "
+                  f"documentos, {progress.chunks_written} chunks "
+                  f"({rate['chunks_per_second']} chunks/s, ETA {rate['eta_seconds']}s)")
+
+    def forget(document_id):
+        """Saca de la versión nueva un documento ya procesado (borrado o actualizado)"""
+        del indexed[document_id]
+        if document_id in skipped:
+            skipped.discard(document_id)
+            return
+        if document_id in progress.documents_failed:
+            progress.documents_failed.remove(document_id)
+        else:
+            progress.documents_done -= 1
+        progress.total_documents -= 1
+        service.delete_by_document_id(document_id)
+
+    def catch_up() -> int:
+        """Aplica los documentos subidos, actualizados o borrados desde la pasada anterior"""
+        vigentes = {doc.id: doc for doc in load_documents()}
+        # Actualizado = otro file_path (update_post guarda el PDF nuevo con otro nombre)
+        cambiados = [
+            document_id for document_id, file_path in indexed.items()
+            if document_id not in vigentes or vigentes[document_id].file_path != file_path
+        ]
+        for document_id in cambiados:
+            forget(document_id)
+        pendientes = [doc for doc in vigentes.values() if doc.id not in indexed]
+        progress.total_documents += len(pendientes)
+        index_all(pendientes)
+        return len(cambiados) + len(pendientes)
+
+    try:
+        documents = load_documents()
+        progress.total_documents = len(documents)
+        progress.save()
+        index_all(documents)
+
+        # Puesta al día sin bloquear escrituras mientras sigan apareciendo cambios
+        for _ in range(3):
+            if not catch_up():
+                break
+
+        with document_writes(exclusive=True):
+            # Última pasada con las escrituras bloqueadas, inmediatamente antes del swap
+            catch_up()
+            if progress.documents_failed and not force:
+                progress.status = "failed"
+                progress.error = f"{len(progress.documents_failed)} documentos fallaron; el alias no se cambió"
+                print(f"❌ {progress.error} ('{target}' queda para inspección)")
+            else:
+                swap_alias(client, alias, target, drop_legacy=drop_legacy)
+                progress.status = "done"
+        if progress.status == "done":
+            dropped = drop_old_versions(client, alias, keep=keep_versions)
+            if dropped:
+                print(f"🧹 Versiones viejas borradas: {', '.join(dropped)}")
+
+    except Exception as e:
+        progress.status = "failed"
+        progress.error = str(e)
+        print(f"❌ Reindexación fallida: {e}")
+
+    progress.finished_at = time.time()
+    progress.save()
+    return progress
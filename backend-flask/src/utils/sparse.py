@@ -0,0 +1,73 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from typing import List
+
+from qdrant_client.models import Modifier, SparseVector, SparseVectorParams
+
+SPARSE_VECTOR_NAME = "bm25"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Palabras funcionales del castellano: no aportan al match léxico y solo inflan los vectores
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuales cuando de del desde donde
+durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos
+fue fueron ha han hasta hay la las le les lo los mas me mi mismo muy ni no nos o otra otras
+otro otros para pero por porque que quien se sea segun ser si sin sino sobre son su sus tambien
+te tiene tienen todo todos tu un una unas uno unos y ya
+""".split())
+
+
+def sparse_vectors_config() -> dict:
+    """Config del vector sparse: Qdrant calcula el IDF sobre la colección (Modifier.IDF)"""
+    return {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+
+
+class BM25SparseEncoder:
+    """
+    Vectores sparse tipo BM25 para búsqueda léxica en Qdrant.
+
+    Cada término se mapea a un índice estable (hash) y su peso es la parte de frecuencia
+    de BM25, saturada con k1 y normalizada por largo con b. El IDF no se calcula acá: lo
+    aplica Qdrant al momento de buscar, así los vectores no dependen del resto del corpus.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_len: float = 150):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Minúsculas, sin tildes, alfanumérico: "Art. 25" -> ["art", "25"], "IF-101" -> ["if", "101"]"""
+        text = unicodedata.normalize('NFD', (text or '').lower())
+        text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+        return [t for t in _TOKEN_RE.findall(text) if t not in STOPWORDS]
+
+    @staticmethod
+    def term_index(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), 'little') & 0x7FFFFFFF
+
+    def _vector(self, weights: dict) -> SparseVector:
+        indices = {}
+        for token, weight in weights.items():
+            index = self.term_index(token)
+            indices[index] = indices.get(index, 0.0) + weight
+        return SparseVector(indices=list(indices), values=list(indices.values()))
+
+    def encode_document(self, text: str) -> SparseVector:
+        tokens = self.tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        return self._vector({
+            token: tf * (self.k1 + 1) / (tf + norm)
+            for token, tf in Counter(tokens).items()
+        })
+
+    def encode_documents(self, texts: List[str]) -> List[SparseVector]:
+        return [self.encode_document(text) for text in texts]
+
+    def encode_query(self, text: str) -> SparseVector:
+        """Cada término de la consulta pesa 1: el score es la suma de BM25 de los términos presentes"""
+        return self._vector({token: 1.0 for token in self.tokenize(text)})
@@ -2,11 +2,16 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from src.core.board.document import Document
 from src.core.database import db
 from src.web.controllers.auth_controller import login_required 
-from src.utils.pdf_chunker import process_pdf_file
-from src.utils.embeddings import EmbeddingService  
-from src.utils.qdrant_service import QdrantService  
+from src.utils.pdf_chunker import PART_SUFFIX_RE, section_base
+from src.utils.embeddings import get_embedding_service
+from src.utils.ingestion import document_metadata, index_pdf, update_pdf
+from src.utils.markdown_cache import evict_markdown
+from src.utils.qdrant_service import get_qdrant_service
+from src.utils.reindex import document_writes
 import os
 import hashlib
+import math
+import time
 from werkzeug.utils import secure_filename
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'data')
@@ -41,6 +46,7 @@ def create():
 
 @document_blueprint.post("/create")
 @login_required
+@document_writes()
 def create_post():
     # 1. Obtener datos
     title = request.form.get("title")
@@ -123,37 +129,19 @@ def create_post():
                 print(f"📄 Procesando PDF con chunking estructurado...")
                 
                 try:
-                    # 3.1 Generar chunks por secciones
-                    chunks = process_pdf_file(
+                    # Chunks por secciones + embeddings + inserción en Qdrant
+                    insert_result = index_pdf(
                         save_path,
-                        metadata={
-                            'document_id': new_doc.id,
-                            'title': title or filename,
-                            'description': description,
-                            'uploaded_by': session["user_id"],
-                            'filename': filename
-                        }
+                        document_metadata(new_doc, filename),
+                        get_qdrant_service()
                     )
-                    print(f"✅ Generados {len(chunks)} chunks estructurados")
                     
-                    # 3.2 Generar embeddings
-                    print(f"🔄 Generando embeddings...")
-                    embedding_service = EmbeddingService()
-                    texts = [chunk['text'] for chunk in chunks]
-                    embeddings = embedding_service.get_embeddings(texts, batch_size=10, prefix="passage: ")
-                    print(f"✅ Embeddings generados")
-                    
-                    # 3.3 Insertar en Qdrant
-                    print(f"📤 Insertando en Qdrant...")
-                    qdrant_service = QdrantService()
-                    success = qdrant_service.insert_chunks(chunks, embeddings, batch_size=100)
-                    
-                    if not success:
-                        raise Exception("Error insertando chunks en Qdrant")
+                    if not insert_result.ok:
+                        raise Exception(f"Error insertando chunks en Qdrant: {insert_result.error}")
                     
                     # 3.4 Todo OK - commit
                     db.session.commit()
-                    flash(f"✅ Documento procesado correctamente. Se generaron {len(chunks)} secciones.", "success")
+                    flash(f"✅ Documento procesado correctamente. Se generaron {insert_result.points_written} secciones.", "success")
                     print(f"🎉 Documento {new_doc.id} procesado completamente")
                     
                 except Exception as e:
@@ -199,6 +187,7 @@ def create_post():
 
 @document_blueprint.post("/delete/<int:id>")
 @login_required
+@document_writes()
 def delete(id):
     """Eliminar documento de BD y Qdrant"""
     doc = db.session.query(Document).get(id)
@@ -211,14 +200,19 @@ def delete(id):
         print(f"🗑️ Eliminando documento {id}...")
         
         # 1. Eliminar de Qdrant primero
-        qdrant_service = QdrantService()
+        qdrant_service = get_qdrant_service()
         qdrant_success = qdrant_service.delete_by_document_id(doc.id)
+        qdrant_service.flush()
         
         if not qdrant_success:
             print("⚠️ Error eliminando de Qdrant, pero continuando...")
         
-        # 2. Eliminar archivo físico
+        # 2. Eliminar archivo físico (y su Markdown del cache de conversión)
         if doc.file_path and os.path.exists(doc.file_path):
+            try:
+                evict_markdown(doc.file_path)
+            except OSError as e:
+                print(f"⚠️ No se pudo limpiar el cache de Markdown: {e}")
             try:
                 os.remove(doc.file_path)
                 print(f"✅ Archivo físico eliminado: {doc.file_path}")
@@ -242,6 +236,80 @@ def delete(id):
     return redirect(url_for("document.index"))
 
 
+@document_blueprint.get("/<int:id>/update")
+@login_required
+def update(id):
+    doc = db.session.query(Document).get(id)
+    if not doc:
+        flash("El documento no existe.", "danger")
+        return redirect(url_for("document.index"))
+    return render_template("document/update.html", doc=doc, active_page='documentos')
+
+
+@document_blueprint.post("/<int:id>/update")
+@login_required
+@document_writes()
+def update_post(id):
+    """Reemplazar el PDF de un documento re-procesando solo los chunks nuevos o modificados"""
+    doc = db.session.query(Document).get(id)
+    if not doc:
+        flash("El documento no existe.", "danger")
+        return redirect(url_for("document.index"))
+
+    file = request.files.get("file")
+    if not file or file.filename == "":
+        flash("No se envió ningún archivo", "danger")
+        return redirect(url_for("document.update", id=id))
+    if not file.filename.lower().endswith('.pdf'):
+        flash("La actualización incremental solo está disponible para PDF", "danger")
+        return redirect(url_for("document.update", id=id))
+
+    save_path = None
+    try:
+        filename = secure_filename(file.filename)
+        save_path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(save_path):
+            import uuid
+            base, ext = os.path.splitext(filename)
+            filename = f"{base}_{uuid.uuid4().hex[:6]}{ext}"
+            save_path = os.path.join(UPLOAD_FOLDER, filename)
+        file.save(save_path)
+        print(f"💾 Nueva versión guardada: {save_path}")
+
+        update_result = update_pdf(save_path, document_metadata(doc, filename), get_qdrant_service())
+        if not update_result.ok:
+            raise Exception(update_result.error)
+
+        # La versión anterior ya no se usa: se borra junto con su Markdown cacheado
+        old_path = doc.file_path
+        doc.file_path = save_path
+        db.session.commit()
+        if old_path and old_path != save_path and os.path.exists(old_path):
+            try:
+                evict_markdown(old_path)
+                os.remove(old_path)
+            except OSError as e:
+                print(f"⚠️ No se pudo borrar la versión anterior: {e}")
+
+        flash(
+            f"✅ Documento actualizado en {update_result.elapsed_seconds:.1f}s: "
+            f"{update_result.added} secciones nuevas, {update_result.updated} actualizadas, "
+            f"{update_result.deleted} eliminadas, {update_result.unchanged} sin cambios.",
+            "success"
+        )
+        return redirect(url_for("document.index"))
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error actualizando documento {id}: {e}")
+        import traceback
+        traceback.print_exc()
+        if save_path and os.path.exists(save_path) and save_path != doc.file_path:
+            os.remove(save_path)
+        flash(f"Error actualizando el documento: {str(e)}", "danger")
+        return redirect(url_for("document.update", id=id))
+
+
 @document_blueprint.get("/<int:id>/chunks")
 @login_required
 def view_chunks(id):
@@ -252,9 +320,16 @@ def view_chunks(id):
         flash("El documento no existe.", "danger")
         return redirect(url_for("document.index"))
     
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 200)
+
     try:
-        qdrant_service = QdrantService()
-        chunks = qdrant_service.get_chunks_by_document(doc.id, limit=200)
+        qdrant_service = get_qdrant_service()
+        total = qdrant_service.count_chunks(doc.id)
+        last_index = qdrant_service.get_last_chunk_index(doc.id)
+        # Las páginas se arman por rango de chunk_index, así que se cuentan sobre el último índice
+        total_pages = max(math.ceil((last_index + 1) / per_page), 1) if last_index is not None else 1
+        chunks = qdrant_service.get_chunks_page(doc.id, page=page, per_page=per_page)
         
         chunks_data = []
         for chunk in chunks:
@@ -265,16 +340,17 @@ def view_chunks(id):
                 'section_level': payload.get('section_level', 0),
                 'chunk_length': payload.get('chunk_length', 0),
                 'chunk_index': payload.get('chunk_index', 0),
-                'text_preview': payload.get('text', '')[:200] + '...'
+                'text_preview': payload.get('pageContent', '')[:200] + '...'
             })
         
-        # Ordenar por chunk_index
-        chunks_data.sort(key=lambda x: x['chunk_index'])
-        
         return render_template(
             "document/chunks.html", 
             document=doc, 
             chunks=chunks_data,
+            total=total,
+            page=page,
+            per_page=per_page,
+            total_pages=total_pages,
             active_page='documentos'
         )
         
@@ -320,7 +396,6 @@ def api_list_documents():
 
 @document_blueprint.post("/api/search", strict_slashes=False)
 def api_search_chunks():
-    import re
     try:
         data = request.get_json()
         query = data.get("query", "").strip()
@@ -329,69 +404,85 @@ def api_search_chunks():
         if not query:
             return {"error": "Query vacía"}, 400
         
+        timings = {}
+        inicio = time.perf_counter()
+
         # 1. Generar embedding de la query
-        embedding_service = EmbeddingService()
+        embedding_service = get_embedding_service()
         query_embedding = embedding_service.get_embedding(query, prefix="query: ")
+        timings["embedding_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
         
         # 2. Buscar en Qdrant
-        qdrant_service = QdrantService()
+        qdrant_service = get_qdrant_service()
+        inicio_busqueda = time.perf_counter()
+        modo_busqueda = data.get("mode") or os.getenv("SEARCH_MODE", "hybrid")
+        if modo_busqueda == "hybrid" and not qdrant_service.has_sparse_vectors:
+            modo_busqueda = "dense"
         resultados_qdrant = qdrant_service.search_similar(
             query_vector=query_embedding,
             limit=20,
-            document_id=document_id
+            document_id=document_id,
+            hnsw_ef=data.get("hnsw_ef"),
+            exact=data.get("exact"),
+            query_text=query,
+            mode=modo_busqueda
         )
+        timings["search_ms"] = round((time.perf_counter() - inicio_busqueda) * 1000, 1)
 
-        # 3. Re-ranking por section_title y section_hierarchy
-        def calcular_score_final(hit, query):
-            score = hit['score']
-            payload = hit['payload']
-
-            def normalizar(texto):
-                import unicodedata
-                texto = texto.lower()
-                return ''.join(
-                    c for c in unicodedata.normalize('NFD', texto)
-                    if unicodedata.category(c) != 'Mn'
-                )
-
-            query_norm = normalizar(query)
-            section_title = normalizar(payload.get('section_title', ''))
-            section_hierarchy = normalizar(payload.get('section_hierarchy', ''))
-
-            palabras = [w for w in query_norm.split() if len(w) > 3]
-            matches_title = sum(1 for w in palabras if w in section_title)
-            matches_hierarchy = sum(1 for w in palabras if w in section_hierarchy)
-
-            score += matches_title * 0.05
-            score += matches_hierarchy * 0.02
-
-            return score
-
-        resultados_qdrant.sort(
-            key=lambda h: calcular_score_final(h, query),
-            reverse=True
-        )
-
-        # 4. Expandir chunks de secciones multi-parte
+        # 4. Expandir contexto según SEARCH_EXPANSION_MODE (o "expansion" en el request):
+        #    section = secciones multi-parte completas, window = ±k chunks vecinos, none = sin expandir
+        modo = data.get("expansion") or os.getenv("SEARCH_EXPANSION_MODE", "section")
         expandidos = []
         secciones_expandidas = set()
 
-        for hit in resultados_qdrant:
-            section_title = hit['payload'].get('section_title', '')
-            doc_id = hit['payload'].get('document_id')
-
-            match = re.match(r'^(.+?)\s*\(parte \d+\)$', section_title)
-
-            if match and doc_id:
-                section_base = match.group(1).strip()
-                clave = f"{doc_id}_{section_base}"
-
-                if clave not in secciones_expandidas:
+        if modo == "window":
+            k = int(data.get("window") or os.getenv("SEARCH_EXPANSION_WINDOW", "1"))
+            # Solo los mejores hits abren ventana: a lo sumo hits * (2k + 1) chunks
+            top = int(os.getenv("SEARCH_EXPANSION_HITS", "4"))
+            mejores = [hit for hit in resultados_qdrant if hit['payload'].get('document_id') is not None][:top]
+            expansion = qdrant_service.get_chunk_windows(
+                ((hit['payload']['document_id'], hit['payload'].get('chunk_index', 0)) for hit in mejores),
+                k=k
+            )
+            timings["expansion"] = expansion.timings()
+
+            hits_por_posicion = {
+                (hit['payload']['document_id'], hit['payload'].get('chunk_index', 0)): hit for hit in mejores
+            }
+            for hit in mejores:
+                ventana = expansion.window_for(hit['payload']['document_id'], hit['payload'].get('chunk_index', 0))
+                if ventana is None:
+                    expandidos.append(hit)
+                elif ventana not in secciones_expandidas:
+                    secciones_expandidas.add(ventana)
+                    for chunk in expansion.groups[ventana]:
+                        posicion = (chunk['payload'].get('document_id'), chunk['payload'].get('chunk_index'))
+                        # Los vecinos heredan el score del hit que abrió la ventana
+                        expandidos.append(hits_por_posicion.get(posicion) or {
+                            **chunk, 'score': hit['score'], 'fused_score': hit.get('fused_score')
+                        })
+
+        elif modo == "section":
+            # Primero se juntan todas las secciones (document_id, section_base) y se resuelven en un solo pedido
+            def clave_seccion(hit):
+                section_title = hit['payload'].get('section_title', '')
+                doc_id = hit['payload'].get('document_id')
+                if PART_SUFFIX_RE.match(section_title) and doc_id:
+                    return doc_id, hit['payload'].get('section_base') or section_base(section_title)
+                return None
+
+            claves = [clave_seccion(hit) for hit in resultados_qdrant]
+            expansion = qdrant_service.get_chunks_by_sections(clave for clave in claves if clave)
+            timings["expansion"] = expansion.timings()
+
+            for hit, clave in zip(resultados_qdrant, claves):
+                if clave is None:
+                    expandidos.append(hit)
+                elif clave not in secciones_expandidas:
                     secciones_expandidas.add(clave)
-                    hermanos = qdrant_service.get_chunks_by_section(section_base, doc_id)
-                    expandidos.extend(hermanos)
-            else:
-                expandidos.append(hit)
+                    expandidos.extend(expansion.groups.get(clave, []))
+        else:
+            expandidos = resultados_qdrant
 
         # 5. Deduplicar por chunk_index + document_id
         vistos_ids = set()
@@ -404,7 +495,7 @@ def api_search_chunks():
 
         resultados_qdrant = resultados_final
 
-        # Solo limitar a 4 si no hubo expansión de secciones
+        # Solo limitar a 4 si no hubo expansión
         if not secciones_expandidas:
             resultados_qdrant = resultados_qdrant[:4]
 
@@ -415,21 +506,28 @@ def api_search_chunks():
             page_content = payload.get('pageContent', '')
             texto_preview = page_content[:1500] + "..." if len(page_content) > 1500 else page_content
 
-            resultados.append({
-                "score": round(calcular_score_final(hit, query), 3),
+            resultado = {
+                "score": round(hit['score'], 3),
                 "texto": texto_preview,
                 "seccion": payload.get('section_title', 'Sin título'),
                 "jerarquia": payload.get('section_hierarchy', ''),
                 "document_id": payload.get('document_id'),
                 "chunk_index": payload.get('chunk_index'),
                 "archivo": payload.get('filename', 'Desconocido')
-            })
+            }
+            if hit.get('fused_score') is not None:
+                # Puntaje de la fusión (RRF/DBSF), el que define el orden; score es el coseno
+                resultado["fused_score"] = round(hit['fused_score'], 4)
+            resultados.append(resultado)
 
         return {
             "query": query,
             "filtro_document_id": document_id,
+            "busqueda": modo_busqueda,
+            "expansion": modo,
             "total_resultados": len(resultados),
-            "resultados": resultados
+            "resultados": resultados,
+            "timings": {**timings, "total_ms": round((time.perf_counter() - inicio) * 1000, 1)}
         }, 200
 
     except Exception as e:
@@ -2,6 +2,12 @@ from flask import Blueprint, render_template
 from src.web.controllers.auth_controller import login_required
 # Importamos la función lógica que acabamos de crear en el Paso 1
 from src.core.status_service import get_system_status
+from src.utils.embeddings import current_embedding_service, get_model_provider
+from src.utils.embedding_workers import current_ingestion_pool
+from src.utils.ingestion import recent_ingests
+from src.utils.markdown_cache import get_markdown_cache
+from src.utils.qdrant_service import get_qdrant_client
+from src.utils.reindex import read_status
 import datetime
 
 status_blueprint = Blueprint("status", __name__, url_prefix="/status")
@@ -20,4 +26,29 @@ def index():
         services=services,
         last_check=last_check,
         active_page="estado" # Esto activa el ítem en el menú lateral
-    )
\ No newline at end of file
+    )
+
+@status_blueprint.get("/api/metrics", strict_slashes=False)
+@login_required
+def api_metrics():
+    """
+    Métricas de rendimiento del backend en JSON (carga del modelo de embeddings, etc.)
+    Uso: GET /status/api/metrics
+
+    Solo lee lo que ya existe: consultar métricas no crea el servicio de embeddings (que
+    sin token de HF carga el modelo) ni levanta el pool de workers de ingesta.
+    """
+    pool = current_ingestion_pool()
+    markdown_cache = get_markdown_cache()
+    embedding_service = current_embedding_service()
+    return {
+        "embeddings": {
+            "local_model": get_model_provider().stats(),
+            "service": embedding_service.stats() if embedding_service else None,
+        },
+        "ingestion_workers": pool.stats() if pool else None,
+        "ingests": recent_ingests(),
+        "markdown_cache": markdown_cache.stats() if markdown_cache else None,
+        "qdrant_latency": get_qdrant_client().stats(),
+        "reindex": read_status()
+    }, 200